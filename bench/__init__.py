@@ -0,0 +1 @@
+"""Performance benchmarks of the add-on. They are not part of the add-on."""
@@ -0,0 +1,115 @@
+"""Micro-benchmarks of deleting guarded snippets from large templates.
+
+Compares the linear scan in gregstyles.assets.guard with the regex-based
+implementation it replaced, and replacing snippets of several add-ons one
+guard at a time with a GuardRegistry.
+
+Usage:
+
+    python3 -m bench.guard
+"""
+import functools
+import re
+import timeit
+from typing import Callable, Dict, List, Tuple
+
+from gregstyles.assets.guard import (
+    GuardRegistry,
+    Guards,
+    append_guarded_snippet,
+    delete_guarded_snippet,
+    guard_css_comments,
+)
+
+GUARDS = guard_css_comments('Anki Greg Styles')
+SIZES = [1 << 10, 1 << 14, 1 << 17, 1 << 20]
+ADDON_COUNTS = [1, 2, 4, 8, 16]
+
+
+def regex_delete_guarded_snippet(tmpl: str, guards: Guards) -> str:
+    """The regex-based implementation that preceded the linear scan."""
+    return re.sub(f'(\n)*{re.escape(guards[0])}.*{re.escape(guards[1])}',
+                  '\n',
+                  tmpl,
+                  flags=re.MULTILINE | re.DOTALL)
+
+
+def synthetic_css(size: int) -> str:
+    """Creates CSS of roughly the given size with a guarded snippet."""
+    rule = '.card-{} {{ color: black; margin: 0px; }}\n'
+    rules: List[str] = []
+    length = 0
+    while length < size:
+        rules.append(rule.format(len(rules)))
+        length += len(rules[-1])
+    half = len(rules) // 2
+    return append_guarded_snippet(''.join(rules[:half]), ''.join(rules[half:]),
+                                  GUARDS)
+
+
+def time_per_call(f: Callable[[], str], repeat: int = 5) -> float:
+    number, _ = timeit.Timer(f).autorange()
+    return min(timeit.Timer(f).repeat(repeat=repeat, number=number)) / number
+
+
+def run() -> List[Tuple[int, float, float]]:
+    results = []
+    for size in SIZES:
+        css = synthetic_css(size)
+        assert (regex_delete_guarded_snippet(css,
+                                             GUARDS) == delete_guarded_snippet(
+                                                 css, GUARDS))
+        results.append(
+            (size,
+             time_per_call(
+                 functools.partial(regex_delete_guarded_snippet, css, GUARDS)),
+             time_per_call(
+                 functools.partial(delete_guarded_snippet, css, GUARDS))))
+    return results
+
+
+def replace_each_guard(css: str, snippets: Dict[Guards, str]) -> str:
+    for guards, snippet in snippets.items():
+        css = append_guarded_snippet(delete_guarded_snippet(css, guards),
+                                     snippet, guards)
+    return css
+
+
+def run_multi_guard(size: int = 1 << 14) -> List[Tuple[int, float, float]]:
+    """Times replacing snippets of several add-ons in CSS of the size."""
+    results = []
+    for count in ADDON_COUNTS:
+        snippets = {
+            guard_css_comments(f'Add-on {i}'): f'.addon-{i} {{}}\n'
+            for i in range(count)
+        }
+        registry = GuardRegistry(snippets)
+        css = registry.replace(synthetic_css(size), snippets)
+        assert replace_each_guard(css,
+                                  snippets) == registry.replace(css, snippets)
+        results.append(
+            (count,
+             time_per_call(functools.partial(replace_each_guard, css,
+                                             snippets)),
+             time_per_call(functools.partial(registry.replace, css,
+                                             snippets))))
+    return results
+
+
+def main() -> None:
+    print(f'{"size [B]":>10} {"regex [us]":>12} {"scan [us]":>12} '
+          f'{"speedup":>8}')
+    for size, regex_time, scan_time in run():
+        print(f'{size:>10} {regex_time * 1e6:>12.1f} {scan_time * 1e6:>12.1f}'
+              f' {regex_time / scan_time:>7.1f}x')
+    print()
+    print(f'{"add-ons":>10} {"each [us]":>12} {"registry [us]":>14} '
+          f'{"speedup":>8}')
+    for count, each_time, registry_time in run_multi_guard():
+        print(f'{count:>10} {each_time * 1e6:>12.1f} '
+              f'{registry_time * 1e6:>14.1f}'
+              f' {each_time / registry_time:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Benchmarks of installing many large assets into a media folder.
+
+Compares installing assets one at a time and hashing them on the next sync,
+as the add-on used to, with reading and hashing them in a thread pool before
+registering them in the media database. Assets are registered through the
+MediaManager of a throwaway Anki collection.
+
+Usage:
+
+    python3 -m bench.install [--assets 36] [--size-mib 4]
+"""
+import argparse
+import os
+import pathlib
+import tempfile
+import time
+from typing import Callable, List
+
+from anki.collection import Collection
+
+from gregstyles.assets import install_media_assets
+from gregstyles.assets.manifest import HashCache, hash_file
+from gregstyles.assets.prepare import prepare_assets
+
+PREFIX = '_greg-styles-'
+WORKER_COUNTS = [1, 2, 4, 8]
+
+
+def make_assets(directory: pathlib.Path, count: int, size: int) -> List[str]:
+    names = []
+    for i in range(count):
+        name = f'{PREFIX}asset-{i}.woff2'
+        (directory / name).write_bytes(os.urandom(size))
+        names.append(name)
+    return names
+
+
+def measure(f: Callable[[], None],
+            setup: Callable[[], None],
+            repeat: int = 3) -> float:
+    """Returns the best wall time of f in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--assets', type=int, default=36)
+    parser.add_argument('--size-mib', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = pathlib.Path(tmp_dir)
+        (root / 'assets').mkdir()
+        (root / 'profile').mkdir()
+        names = make_assets(root / 'assets', args.assets, args.size_mib << 20)
+        col = Collection(str(root / 'profile' / 'collection.anki2'))
+        media = col.media
+        media_dir = pathlib.Path(media.dir())
+
+        def clear_media() -> None:
+            for name in os.listdir(media_dir):
+                if name.startswith(PREFIX):
+                    (media_dir / name).unlink()
+
+        def install_one_by_one() -> None:
+            for name in names:
+                media.add_file(str(root / 'assets' / name))
+            # The next sync hashed the installed assets.
+            for name in names:
+                hash_file(media_dir / name)
+
+        def install_prepared(workers: int) -> Callable[[], None]:
+
+            def install() -> None:
+                hash_cache = HashCache()
+                for asset in prepare_assets(root / 'assets', names, workers):
+                    media.write_data(asset.name, asset.data)
+                    hash_cache.record(media_dir / asset.name, asset.entry)
+
+            return install
+
+        total_mib = args.assets * args.size_mib
+        print(f'Installing {args.assets} assets of {args.size_mib} MiB '
+              f'({total_mib} MiB)')
+        print(f'{"method":>24} {"time [ms]":>10} {"MiB/s":>8}')
+        seconds = measure(install_one_by_one, clear_media)
+        print(f'{"one by one + rehash":>24} {seconds * 1e3:>10.1f} '
+              f'{total_mib / seconds:>8.1f}')
+        for workers in WORKER_COUNTS:
+            seconds = measure(install_prepared(workers), clear_media)
+            print(f'{f"prepared, {workers} threads":>24} '
+                  f'{seconds * 1e3:>10.1f} {total_mib / seconds:>8.1f}')
+        seconds = measure(
+            lambda: install_media_assets(media, root / 'assets', names,
+                                         HashCache()), clear_media)
+        print(f'{"install_media_assets":>24} {seconds * 1e3:>10.1f} '
+              f'{total_mib / seconds:>8.1f}')
+        col.close()
+
+
+if __name__ == '__main__':
+    main()
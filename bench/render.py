@@ -0,0 +1,183 @@
+"""Benchmarks of rendering cards styled by the add-on.
+
+Renders the question and answer of every card of a throwaway collection with
+Anki's template renderer, once before the add-on styles the note types and
+once for each way of styling them. Reports the render time, the size of the
+rendered HTML, and the size of the CSS that comes with each card, so that
+style changes can be judged by what they cost per card.
+
+Usage:
+
+    python3 -m bench.render [--notes 200] [--output results.json]
+"""
+import argparse
+import json
+import pathlib
+import platform
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+from anki.collection import Card, Collection
+from anki.decks import DeckId
+
+from gregstyles import core
+from gregstyles.assets import reconfigure_cards
+from gregstyles.assets.css import minify
+from gregstyles.assets.model import AnkiModelModifier, utf8_size
+
+CSS_ASSET = f'{core.ASSET_PREFIX}main.css'
+CSS = (pathlib.Path(__file__).parent.parent / 'assets' / CSS_ASSET).read_text()
+
+# Stock note types of a new collection and fields of their notes. The fields
+# use a few of the stylesheet's classes, so that tree shaking keeps some rules.
+NOTES: Dict[str, List[str]] = {
+    'Basic': [
+        '<div class="text-center">Question {0}</div>',
+        '<pre class="vim">:%s/foo/bar/g</pre>\n<kbd>Esc</kbd> {0}',
+    ],
+    'Basic (and reversed card)': [
+        'Term {0}',
+        '<div class="flex justify-center"><img src="term-{0}.png"></div>',
+    ],
+    'Cloze': [
+        '<code class="git-scm">git {{{{c1::rebase}}}} {0}</code>',
+        '<div id="notes">Note {0}</div>',
+    ],
+}
+
+Result = Dict[str, Any]
+
+
+def add_notes(col: Collection, count: int) -> None:
+    for name, fields in NOTES.items():
+        model = col.models.by_name(name)
+        assert model is not None, f'{name} is not a stock note type.'
+        for i in range(count):
+            note = col.new_note(model)
+            for field, value in enumerate(fields):
+                note.fields[field] = value.format(i)
+            col.add_note(note, deck_id=DeckId(1))
+
+
+def render(cards: List[Card]) -> List[Card]:
+    for card in cards:
+        card.render_output(reload=True)
+    return cards
+
+
+def measure(f: Callable[[], Any], repeat: int = 5) -> float:
+    """Returns the best wall time of f in seconds after a warm-up run."""
+    f()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_variant(variant: str, cards: List[Card]) -> Result:
+    seconds = measure(lambda: render(cards))
+    html_bytes = css_bytes = 0
+    for card in cards:
+        output = card.render_output()
+        html_bytes += (utf8_size(output.question_text) +
+                       utf8_size(output.answer_text))
+        css_bytes += utf8_size(output.css)
+    count = len(cards)
+    result = {
+        'variant': variant,
+        'cards': count,
+        'seconds_per_card': seconds / count,
+        'html_bytes_per_card': html_bytes / count,
+        'css_bytes_per_card': css_bytes / count,
+    }
+    print(
+        f'{variant:<32} {count:>6} {seconds / count * 1e6:>12.1f} '
+        f'{html_bytes / count:>12.0f} {css_bytes / count:>12.0f}',
+        file=sys.stderr)
+    return result
+
+
+def run(col: Collection) -> List[Result]:
+    models = AnkiModelModifier(col.models)
+    note_markup = core.note_markup(col)
+    minified = minify(CSS)
+    # Styling variants, the first of which clears the add-on's styles.
+    variants: Dict[str, Callable[[], Any]] = {
+        'unstyled':
+        lambda: reconfigure_cards(
+            models, external_css=[], internal_css='', guard=core.GUARD),
+        'inline':
+        lambda: reconfigure_cards(
+            models, external_css=[], internal_css=CSS, guard=core.GUARD),
+        'inline, minified':
+        lambda: reconfigure_cards(
+            models, external_css=[], internal_css=minified, guard=core.GUARD),
+        'inline, tree-shaken':
+        lambda: reconfigure_cards(models,
+                                  external_css=[],
+                                  internal_css=CSS,
+                                  guard=core.GUARD,
+                                  note_markup=note_markup),
+        'inline, minified, tree-shaken':
+        lambda: reconfigure_cards(models,
+                                  external_css=[],
+                                  internal_css=minified,
+                                  guard=core.GUARD,
+                                  note_markup=note_markup),
+        # The imported stylesheet is loaded by the webview, not the renderer.
+        'import':
+        lambda: reconfigure_cards(models,
+                                  external_css=[],
+                                  internal_css='',
+                                  guard=core.GUARD,
+                                  imported_css=[CSS_ASSET]),
+    }
+    print(
+        f'{"variant":<32} {"cards":>6} {"µs/card":>12} {"HTML B/card":>12} '
+        f'{"CSS B/card":>12}',
+        file=sys.stderr)
+    results = []
+    for variant, configure in variants.items():
+        configure()
+        # Cards cache their note type, so they are loaded after styling.
+        cards = [col.get_card(cid) for cid in col.find_cards('')]
+        results.append(bench_variant(variant, cards))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--notes',
+                        type=int,
+                        default=200,
+                        help='The number of notes of each note type.')
+    parser.add_argument('--output',
+                        type=pathlib.Path,
+                        help='The JSON file to write the results to.')
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        col = Collection(str(pathlib.Path(tmp_dir) / 'collection.anki2'))
+        try:
+            add_notes(col, args.notes)
+            results = run(col)
+        finally:
+            col.close()
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'notes_per_note_type': args.notes,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""Benchmarks of syncing assets at collection scale.
+
+Times the sync phases against synthetic collections of up to 5,000 note
+types, templates of up to 1 MiB, and media folders of up to 500,000 files.
+
+Usage:
+
+    python3 -m bench.sync [--quick] [--output results.json]
+
+The results are written as JSON, so that runs can be compared.
+"""
+import argparse
+import json
+import pathlib
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, cast
+
+from anki.collection import ModelManager
+from anki.media import MediaManager
+
+from gregstyles.assets import (
+    AnkiAssetManager,
+    list_my_assets,
+    reconfigure_cards,
+    sync_assets,
+)
+from gregstyles.assets.guard import delete_guarded_snippet, guard_css_comments
+from gregstyles.assets.model import AnkiModelModifier
+
+from .synthetic import (
+    SyntheticMediaManager,
+    SyntheticModelManager,
+    synthetic_template,
+)
+
+GUARD = 'Anki Greg Styles'
+PREFIX = '_greg-styles-'
+MANIFEST = f'{PREFIX}manifest.json'
+CSS = (pathlib.Path(__file__).parent.parent / 'assets' /
+       f'{PREFIX}main.css').read_text()
+
+Result = Dict[str, Any]
+
+
+def measure(f: Callable[[], Any],
+            setup: Optional[Callable[[], None]] = None,
+            repeat: int = 3) -> float:
+    """Returns the best wall time of f in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(f: Callable[[], Any],
+                setup: Optional[Callable[[], None]] = None) -> int:
+    """Returns the peak of transient memory that f allocates in bytes.
+
+    Memory that f keeps allocated, e.g., saved synthetic models, doesn’t count.
+    """
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        f()
+        current, peak = tracemalloc.get_traced_memory()
+        return peak - current
+    finally:
+        tracemalloc.stop()
+
+
+def result(benchmark: str, seconds: float, **params: Any) -> Result:
+    print(
+        f'{benchmark:<32} {json.dumps(params):<48} {seconds * 1e3:>10.2f} ms',
+        file=sys.stderr)
+    return {'benchmark': benchmark, 'params': params, 'seconds': seconds}
+
+
+def memory_result(benchmark: str, peak_bytes: int, **params: Any) -> Result:
+    print(f'{benchmark:<32} {json.dumps(params):<48} ' +
+          f'{peak_bytes / (1 << 20):>9.2f} MiB',
+          file=sys.stderr)
+    return {'benchmark': benchmark, 'params': params, 'peak_bytes': peak_bytes}
+
+
+def bench_models(model_count: int, template_size: int) -> List[Result]:
+    params = {'models': model_count, 'template_bytes': template_size}
+    manager = SyntheticModelManager(model_count, template_size)
+    models = AnkiModelModifier(cast(ModelManager, manager))
+
+    def reset() -> None:
+        nonlocal manager, models
+        manager = SyntheticModelManager(model_count, template_size)
+        models = AnkiModelModifier(cast(ModelManager, manager))
+
+    def configure() -> None:
+        reconfigure_cards(models,
+                          external_css=[],
+                          internal_css=CSS,
+                          guard=GUARD)
+
+    results = [
+        result('reconfigure_cards (configure)', measure(configure, reset),
+               **params),
+        # Models are streamed, so the peak shouldn’t grow with the model count.
+        memory_result('reconfigure_cards (configure, peak)',
+                      peak_memory(configure, reset), **params),
+    ]
+    results.append(
+        result(
+            'reconfigure_cards (no change)',
+            measure(lambda: reconfigure_cards(
+                models, external_css=[], internal_css=CSS, guard=GUARD)),
+            **params))
+
+    def reset_configured() -> None:
+        reset()
+        configure()
+
+    results.append(
+        result(
+            'reconfigure_cards (clear)',
+            measure(
+                lambda: reconfigure_cards(
+                    models, external_css=[], internal_css='', guard=GUARD),
+                reset_configured), **params))
+    return results
+
+
+def bench_guard(template_size: int) -> List[Result]:
+    guards = guard_css_comments(GUARD)
+    tmpl = synthetic_template(template_size) + guards[0] + CSS + guards[1]
+    return [
+        result('delete_guarded_snippet',
+               measure(lambda: delete_guarded_snippet(tmpl, guards),
+                       repeat=10),
+               template_bytes=template_size)
+    ]
+
+
+def bench_media(root: pathlib.Path, file_count: int,
+                model_count: int) -> List[Result]:
+    params = {'media_files': file_count, 'models': model_count}
+    plugin_dir = root / 'asset-files'
+    plugin_dir.mkdir(exist_ok=True)
+    (plugin_dir / f'{PREFIX}main.css').write_text(CSS)
+    media = SyntheticMediaManager(root / f'media-{file_count}', file_count)
+    media_dir = pathlib.Path(media.dir())
+    results = [
+        result('list_my_assets',
+               measure(lambda: list_my_assets(media_dir, PREFIX)), **params)
+    ]
+
+    def asset_manager() -> AnkiAssetManager:
+        return AnkiAssetManager(AnkiModelModifier(
+            cast(ModelManager, SyntheticModelManager(model_count, 1 << 10))),
+                                cast(MediaManager, media),
+                                external_css=[],
+                                internal_css=CSS,
+                                style_assets=[f'{PREFIX}main.css'],
+                                guard=GUARD,
+                                plugin_assets=plugin_dir,
+                                asset_prefix=PREFIX,
+                                manifest_name=MANIFEST)
+
+    def uninstall() -> None:
+        for asset in list_my_assets(media_dir, PREFIX):
+            (media_dir / asset).unlink()
+
+    results.append(
+        result('sync_assets (install)',
+               measure(lambda: sync_assets(asset_manager()), uninstall),
+               **params))
+    results.append(
+        result('sync_assets (up to date)',
+               measure(lambda: sync_assets(asset_manager())), **params))
+    return results
+
+
+def run(quick: bool) -> List[Result]:
+    model_counts = [1, 100, 1000] if quick else [1, 100, 1000, 5000]
+    template_sizes = ([1 << 10, 1 << 16]
+                      if quick else [1 << 10, 1 << 16, 1 << 20])
+    media_counts = [10_000] if quick else [10_000, 100_000, 500_000]
+
+    results: List[Result] = []
+    for model_count in model_counts:
+        results += bench_models(model_count, 1 << 10)
+    for template_size in template_sizes:
+        results += bench_models(10, template_size)
+        results += bench_guard(template_size)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for media_count in media_counts:
+            results += bench_media(pathlib.Path(tmp_dir), media_count, 100)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--quick',
+                        action='store_true',
+                        help='Run at a smaller scale.')
+    parser.add_argument('--output',
+                        type=pathlib.Path,
+                        help='The JSON file to write the results to.')
+    args = parser.parse_args()
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'quick': args.quick,
+        'results': run(args.quick),
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
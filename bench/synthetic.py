@@ -0,0 +1,134 @@
+"""Synthetic Anki collections for benchmarks.
+
+The managers mimic the parts of Anki’s ModelManager and MediaManager that the
+add-on uses, including the cost of materializing model dicts.
+"""
+import os
+import pathlib
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+__all__ = [
+    'SyntheticMediaManager',
+    'SyntheticModelManager',
+    'synthetic_template',
+]
+
+Model = Dict[str, Any]
+
+
+def synthetic_template(size: int) -> str:
+    """Creates a card template of roughly the given size in bytes."""
+    line = '<div class="field-{0}">{{{{Field{0}}}}}</div>\n'
+    lines: List[str] = []
+    length = 0
+    while length < size:
+        lines.append(line.format(len(lines)))
+        length += len(lines[-1])
+    return ''.join(lines)
+
+
+def copy_model(model: Model) -> Model:
+    return dict(model, tmpls=[dict(tmpl) for tmpl in model['tmpls']])
+
+
+class NotetypeNameId(NamedTuple):
+    id: int
+    name: str
+
+
+class SyntheticDB:
+
+    def __init__(self, models: 'SyntheticModelManager') -> None:
+        self.models = models
+
+    def execute(self, sql: str) -> List[Tuple[int, int, int]]:
+        return [(mid, model['mod'], model['usn'])
+                for mid, model in self.models.models.items()]
+
+
+class SyntheticModelManager:
+    """An in-memory ModelManager that copies and caches models like Anki."""
+
+    def __init__(self,
+                 model_count: int,
+                 template_size: int,
+                 templates_per_model: int = 2) -> None:
+        template = synthetic_template(template_size)
+        self.models: Dict[int, Model] = {
+            mid: {
+                'id':
+                mid,
+                'name':
+                f'Note type {mid}',
+                'mod':
+                0,
+                'usn':
+                0,
+                'tmpls': [{
+                    'name': f'Card {i}',
+                    'qfmt': template,
+                    'afmt': template
+                } for i in range(templates_per_model)],
+                'css':
+                '.card { font-size: 20px; }\n',
+            }
+            for mid in range(1, model_count + 1)
+        }
+        self._cache: Dict[int, Model] = {}
+        self.saves = 0
+        self.col = self
+        self.db = SyntheticDB(self)
+
+    def all(self) -> List[Model]:
+        return [copy_model(model) for model in self.models.values()]
+
+    def all_names_and_ids(self) -> List[NotetypeNameId]:
+        return [
+            NotetypeNameId(id=mid, name=model['name'])
+            for mid, model in self.models.items()
+        ]
+
+    def get(self, mid: int) -> Optional[Model]:
+        model = self._cache.get(mid)
+        if model is None and mid in self.models:
+            model = self._cache[mid] = copy_model(self.models[mid])
+        return model
+
+    def _get_cached(self, mid: int) -> Optional[Model]:
+        return self._cache.get(mid)
+
+    def _remove_from_cache(self, mid: int) -> None:
+        self._cache.pop(mid, None)
+
+    def save(self, model: Model) -> None:
+        self.saves += 1
+        self._remove_from_cache(model['id'])
+        model = copy_model(model)
+        model['mod'] += 1
+        model['usn'] = -1
+        self.models[model['id']] = model
+
+
+class SyntheticMediaManager:
+    """A MediaManager over a real directory filled with unrelated files."""
+
+    def __init__(self, media_dir: pathlib.Path, file_count: int) -> None:
+        self.media_dir = media_dir
+        media_dir.mkdir(parents=True, exist_ok=True)
+        for i in range(file_count):
+            (media_dir / f'image-{i}.jpg').touch()
+
+    def dir(self) -> str:
+        return str(self.media_dir)
+
+    def add_file(self, path: str) -> str:
+        with open(path, 'rb') as f:
+            return self.write_data(os.path.basename(path), f.read())
+
+    def write_data(self, desired_fname: str, data: bytes) -> str:
+        (self.media_dir / desired_fname).write_bytes(data)
+        return desired_fname
+
+    def trash_files(self, fnames: List[str]) -> None:
+        for fname in fnames:
+            (self.media_dir / fname).unlink()
@@ -1,2 +1,22 @@
-"""Module-level entry point for the add-on into Anki 2.1"""
-from . import main as main
+"""Module-level entry point for the add-on into Anki 2.1
+
+Importing the add-on only registers a hook. The implementation and its Anki
+imports load when a profile opens, so that Anki’s start-up doesn’t pay for
+them.
+
+Without Anki’s GUI, e.g., in the headless batch sync, there is nothing to
+hook into.
+"""
+
+
+def on_profile_did_open() -> None:
+    from . import main
+    main.on_profile_did_open()
+
+
+try:
+    from aqt import gui_hooks
+except ImportError:
+    pass
+else:
+    gui_hooks.profile_did_open.append(on_profile_did_open)
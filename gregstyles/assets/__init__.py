@@ -1,135 +1,566 @@
 """This module manages an add-on’s assets."""
+import contextlib
+import functools
 import os.path
 import pathlib
-from typing import Callable, List, Optional, Protocol
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Protocol,
+    Tuple,
+)
 
 from anki.media import MediaManager
+from anki.models import NotetypeDict
 
+from .css import Markup, scan_markup, tree_shake
+from .fingerprint import ModelCache, ModelStamp, content_hash
 from .guard import (
+    GuardRegistry,
+    Guards,
     append_guarded_snippet,
-    delete_guarded_snippet,
     guard_css_comments,
     guard_html_comments,
+    prepend_guarded_snippet,
+)
+from .instrumentation import SyncReport, timed
+from .manifest import (
+    UNKNOWN_ENTRY,
+    AssetDiff,
+    HashCache,
+    Manifest,
+    build_manifest,
+    diff_manifests,
+    dumps_manifest,
+    read_manifest,
 )
-from .model import ModelModifier
+from .model import (
+    ModelAwareTransformer,
+    ModelChange,
+    ModelModifier,
+    ModificationReport,
+    StringTransformer,
+    compose,
+)
+from .plan import OutdatedPlanError, SyncPlan
+from .prepare import prepare_assets
 
 __all__ = [
     'sync_assets',
     'AssetManager',
     'AnkiAssetManager',
-    'read_asset_version',
+    'NoteMarkup',
+    'load_plugin_manifest',
+    'OutdatedPlanError',
+    'ProgressCallback',
+    'SyncPlan',
 ]
 
+ProgressCallback = Callable[[str], None]
+
+# Returns the markup of notes of the model with the given id, e.g., of their
+# fields.
+NoteMarkup = Callable[[int], Markup]
+
 
 class AssetManager(Protocol):
-    """An object that can install/delete an add-on’s assets."""
+    """An object that can sync an add-on’s assets."""
 
-    # TODO: Use `sync` semantics instead. It’s safer and more inline
-    # with intended use.
-    def install_assets(self) -> None:
-        return None
+    def plan_sync(self) -> SyncPlan:
+        """Computes the changes of assets and cards that a sync makes."""
+        return SyncPlan()
 
-    def delete_assets(self) -> None:
+    def apply_plan(self, plan: SyncPlan) -> None:
+        """Makes exactly the changes of the plan."""
         return None
 
 
 class AnkiAssetManager:
 
-    def __init__(self, models: ModelModifier, media: MediaManager,
-                 external_css: List[str], internal_css: str, guard: str,
-                 plugin_assets: pathlib.Path, asset_prefix: str) -> None:
+    def __init__(self,
+                 models: ModelModifier,
+                 media: MediaManager,
+                 external_css: List[str],
+                 internal_css: str,
+                 style_assets: List[str],
+                 guard: str,
+                 plugin_assets: pathlib.Path,
+                 asset_prefix: str,
+                 manifest_name: str,
+                 model_cache: Optional[ModelCache] = None,
+                 imported_css: Optional[List[str]] = None,
+                 report: Optional[SyncReport] = None,
+                 hash_cache: Optional[HashCache] = None,
+                 note_markup: Optional[NoteMarkup] = None,
+                 plugin_manifest: Optional[Manifest] = None) -> None:
+        """
+        Args:
+            external_css: CSS assets linked from templates.
+            internal_css: CSS copied into each model’s styling.
+            style_assets: Assets whose changes require reconfiguring cards.
+            manifest_name: The file name of the asset manifest.
+            model_cache: The cache of configured models. Without it, models
+              are reconfigured only when style assets change.
+            imported_css: CSS assets imported from each model’s styling.
+            report: The report to record statistics of this manager’s
+              operations in. Nothing is recorded by default.
+            hash_cache: The cache of hashes of installed assets. Without it,
+              installed assets are hashed on every sync.
+            note_markup: If given, internal CSS is tree-shaken for each model
+              against the markup of its templates and notes.
+            plugin_manifest: The add-on’s manifest if already loaded.
+              Otherwise, it is read from plugin_assets when needed.
+        """
         self.models = models
         self.media = media
         self.external_css: List[str] = external_css
         self.internal_css: str = internal_css
+        self.imported_css: List[str] = imported_css or []
+        self.style_assets: List[str] = style_assets
         self.guard: str = guard
         self.plugin_assets = plugin_assets
         self.asset_prefix = asset_prefix
+        self.manifest_name = manifest_name
+        self.model_cache = model_cache
+        self.report = report
+        self.hash_cache = hash_cache or HashCache()
+        self.note_markup = note_markup
+        self.loaded_manifest = plugin_manifest
+
+    def reinstall_assets(self, full_scan: bool = False) -> None:
+        """Deletes and installs all assets with a single pass over models.
+
+        Args:
+            full_scan: Whether to find installed assets by scanning the media
+              folder instead of reading the installed manifest. The scan is
+              slow on large media folders, but it repairs a lost manifest.
+        """
+        manifest = self.plugin_manifest()
+        self.delete_media(self.installed_assets(full_scan))
+        self.install_media(list(manifest))
+        self.reconfigure_cards()
+        self.write_installed_manifest(manifest)
+
+    def reconfigure_cards(self,
+                          model_ids: Optional[List[int]] = None
+                          ) -> ModificationReport:
+        """Reconfigures cards and records them in the model cache."""
+        with timed(self.report, 'models'):
+            report = reconfigure_cards(self.models,
+                                       external_css=self.external_css,
+                                       internal_css=self.internal_css,
+                                       guard=self.guard,
+                                       model_ids=model_ids,
+                                       imported_css=self.imported_css,
+                                       note_markup=self.note_markup)
+        self.record(report)
+        self.cache_models(model_ids)
+        return report
+
+    def apply_model_changes(self,
+                            changes: List[ModelChange]) -> ModificationReport:
+        """Saves planned model changes and records them in the model cache."""
+        with timed(self.report, 'models'):
+            report = self.models.apply(changes)
+        self.record(report)
+        self.cache_models([change.id for change in changes])
+        return report
+
+    def cache_models(self, model_ids: Optional[List[int]] = None) -> None:
+        """Records models as configured in the model cache.
+
+        Args:
+            model_ids: The configured models. All models by default.
+        """
+        if self.model_cache is not None:
+            stamps = self.models.model_stamps()
+            self.model_cache.update(
+                stamps, self.managed_content_hash(),
+                stamps.keys() if model_ids is None else model_ids)
+            self.model_cache.save()
+
+    def record(self, modification: ModificationReport) -> None:
+        if self.report:
+            self.report.add_modification(modification)
+
+    def install_media(self, assets: List[str]) -> None:
+        with timed(self.report, 'media'):
+            install_media_assets(self.media,
+                                 plugin_assets=self.plugin_assets,
+                                 assets=assets,
+                                 hash_cache=self.hash_cache)
+            self.hash_cache.save()
+        if self.report:
+            self.report.media_added += len(assets)
+
+    def delete_media(self, assets: List[str]) -> None:
+        with timed(self.report, 'media'):
+            delete_media_assets(self.media, assets)
+        if self.report:
+            self.report.media_trashed += len(assets)
+
+    def managed_content_hash(self) -> str:
+        return content_hash(self.guard, self.internal_css, *self.external_css,
+                            '', *self.imported_css, '',
+                            'tree-shaken' if self.note_markup else '')
+
+    def stale_models(self, stamps: Dict[int, ModelStamp]) -> List[int]:
+        """Lists models that changed since the add-on configured them."""
+        if self.model_cache is None:
+            return []
+        return self.model_cache.stale_models(stamps,
+                                             self.managed_content_hash())
+
+    def plan_sync(self) -> SyncPlan:
+        """Computes the changes that sync_assets would make without writing.
+
+        Returns:
+            The plan, which apply_plan can execute.
+        """
+        diff = self.diff_assets()
+        plan = SyncPlan(diff=diff, content_hash=self.managed_content_hash())
+        if not diff.is_empty():
+            plugin_manifest = self.plugin_manifest()
+            plan.media_added = {
+                asset: plugin_manifest[asset].size
+                for asset in diff.added + diff.changed
+            }
+            plan.media_added[self.manifest_name] = len(
+                dumps_manifest(plugin_manifest).encode('utf-8'))
+            plan.media_trashed = diff.changed + diff.removed
+            if (anki_media_directory(self.media) /
+                    self.manifest_name).exists():
+                plan.media_trashed.append(self.manifest_name)
+        stamps = self.models.model_stamps()
+        model_ids = (list(stamps) if self.needs_reconfiguration(diff) else
+                     self.stale_models(stamps))
+        plan.model_stamps = {mid: stamps[mid] for mid in model_ids}
+        template_f, style_f = reconfigurers(self.external_css,
+                                            self.internal_css, self.guard,
+                                            self.imported_css,
+                                            self.note_markup)
+        with timed(self.report, 'models'):
+            plan.model_changes = self.models.plan(template_f,
+                                                  style_f,
+                                                  model_ids=model_ids)
+        return plan
+
+    def apply_plan(self, plan: SyncPlan) -> None:
+        """Makes exactly the changes of the plan and saves caches.
+
+        Planning saves no caches, so that a dry run writes nothing.
+
+        Raises:
+            OutdatedPlanError: The assets, the managed content, or a planned
+              model have changed since the plan was computed.
+        """
+        if plan.is_empty():
+            self.record_unchanged_models(plan, self.models.model_stamps())
+            self.hash_cache.save()
+            return None
+        if plan.content_hash != self.managed_content_hash():
+            raise OutdatedPlanError('The add-on’s styles have changed.')
+        if self.diff_assets() != plan.diff:
+            raise OutdatedPlanError('The installed assets have changed.')
+        stamps = self.models.model_stamps()
+        for change in plan.model_changes:
+            if stamps.get(change.id) != change.stamp:
+                raise OutdatedPlanError(
+                    f'The note type {change.name} has changed.')
+        if not plan.diff.is_empty():
+            # Anki renames new files that clash with existing ones, so trash
+            # stale files first.
+            self.delete_media(plan.diff.changed + plan.diff.removed)
+            self.install_media(plan.diff.added + plan.diff.changed)
+        if plan.model_changes:
+            self.apply_model_changes(plan.model_changes)
+        self.record_unchanged_models(plan, stamps)
+        if not plan.diff.is_empty():
+            # Write the manifest last, so that an interrupted sync gets
+            # retried.
+            self.write_installed_manifest(self.plugin_manifest())
+        self.hash_cache.save()
+
+    def record_unchanged_models(self, plan: SyncPlan,
+                                stamps: Dict[int, ModelStamp]) -> None:
+        """Records checked models that needed no change in the model cache.
+
+        Args:
+            plan: The applied plan.
+            stamps: Stamps of all models before the plan was applied.
+        """
+        if self.model_cache is None:
+            return
+        changed = {change.id for change in plan.model_changes}
+        unchanged = [
+            mid for mid, stamp in plan.model_stamps.items()
+            if mid not in changed and stamps.get(mid) == stamp
+        ]
+        if unchanged:
+            self.model_cache.update(stamps, plan.content_hash, unchanged)
+            self.model_cache.save()
+
+    def repair_assets(self) -> None:
+        """Reinstalls assets, finding stray ones with a media folder scan."""
+        self.reinstall_assets(full_scan=True)
+
+    def plugin_manifest(self) -> Manifest:
+        """Reads the add-on’s manifest or builds it if it’s missing."""
+        if self.loaded_manifest is not None:
+            return self.loaded_manifest
+        return load_plugin_manifest(self.plugin_assets, self.asset_prefix,
+                                    self.manifest_name)
+
+    def installed_manifest(self, plugin_manifest: Manifest) -> Manifest:
+        """Describes the add-on’s assets installed in the media folder.
+
+        Entries come from the installed files themselves, so that files
+        changed or deleted behind the add-on’s back get replaced. Hashes are
+        cached, so only files that have changed since the last sync get
+        hashed.
+
+        New hashes are only cached in memory until the next apply_plan.
+
+        If the media folder has no manifest, e.g., because it predates
+        manifests, the known assets that are present get unknown entries, so
+        that they get replaced and recorded in a new manifest.
+        """
+        media_dir = anki_media_directory(self.media)
+        recorded = read_manifest(media_dir / self.manifest_name)
+        if recorded is None:
+            return {
+                asset: UNKNOWN_ENTRY
+                for asset in present_media_assets(media_dir, plugin_manifest)
+            }
+        manifest: Manifest = {}
+        for asset in plugin_manifest:
+            entry = self.hash_cache.entry(media_dir / asset,
+                                          expected=plugin_manifest[asset])
+            if entry is not None:
+                manifest[asset] = entry
+        # Assets that are no longer the add-on’s only need to be present.
+        stale_assets = [
+            asset for asset in recorded if asset not in plugin_manifest
+        ]
+        for asset in present_media_assets(media_dir, stale_assets):
+            manifest[asset] = recorded[asset]
+        return manifest
+
+    def installed_assets(self, full_scan: bool = False) -> List[str]:
+        """Lists the add-on’s assets, manifest included, in the media folder.
+
+        Args:
+            full_scan: Whether to scan the media folder. Otherwise, only files
+              listed in the installed manifest are checked.
+        """
+        media_dir = anki_media_directory(self.media)
+        if full_scan:
+            return list_my_assets(media_dir, self.asset_prefix)
+        manifest = read_manifest(media_dir / self.manifest_name) or {}
+        return present_media_assets(media_dir, [*manifest, self.manifest_name])
+
+    def write_installed_manifest(self, manifest: Manifest) -> None:
+        if (anki_media_directory(self.media) / self.manifest_name).exists():
+            # Anki renames new files that clash with existing ones.
+            self.delete_media([self.manifest_name])
+        with timed(self.report, 'media'):
+            self.media.write_data(self.manifest_name,
+                                  dumps_manifest(manifest).encode('utf-8'))
+        if self.report:
+            self.report.media_added += 1
+
+    def fingerprint(self) -> str:
+        """Fingerprints the state that a sync depends on.
+
+        The fingerprint covers the add-on’s manifest and managed content,
+        modification times and sizes of installed assets, and stamps of
+        models. Computing it takes a stat per asset and a query of model
+        stamps, without reading any files.
+        """
+        plugin_manifest = self.plugin_manifest()
+        media_dir = anki_media_directory(self.media)
+        media_stats = [
+            file_stat(media_dir / asset)
+            for asset in [*plugin_manifest, self.manifest_name]
+        ]
+        return content_hash(dumps_manifest(plugin_manifest),
+                            self.managed_content_hash(), repr(media_stats),
+                            repr(sorted(self.models.model_stamps().items())))
+
+    def diff_assets(self) -> AssetDiff:
+        plugin_manifest = self.plugin_manifest()
+        return diff_manifests(self.installed_manifest(plugin_manifest),
+                              plugin_manifest)
+
+    def needs_reconfiguration(self, diff: AssetDiff) -> bool:
+        """Checks if the asset changes require reconfiguring all models."""
+        # Imports only depend on asset names, not content.
+        return (diff.touches(self.style_assets) or AssetDiff(
+            added=diff.added, removed=diff.removed).touches(self.imported_css))
 
-    def install_assets(self) -> None:
-        install_media_assets(self.media,
-                             plugin_assets=self.plugin_assets,
-                             asset_prefix=self.asset_prefix)
-        configure_cards(self.models,
-                        external_css=self.external_css,
-                        internal_css=self.internal_css,
-                        guard=self.guard)
 
-    def delete_assets(self) -> None:
-        clear_cards(self.models, guard=self.guard)
-        delete_media_assets(self.media, asset_prefix=self.asset_prefix)
+def anki_media_directory(media: MediaManager) -> pathlib.Path:
+    return pathlib.Path(media.dir())
 
 
-def has_newer_version(media: MediaManager, plugin_assets: pathlib.Path,
-                      asset_version_file_name: str) -> bool:
-    """Checks if the add-on has a newer asset version than the one in the media.
+def load_plugin_manifest(plugin_assets: pathlib.Path, asset_prefix: str,
+                         manifest_name: str) -> Manifest:
+    """Reads the add-on’s manifest or builds it if it’s missing."""
+    manifest = read_manifest(plugin_assets / manifest_name)
+    if manifest is None:
+        manifest = build_manifest(plugin_assets, asset_prefix, manifest_name)
+    return manifest
 
-    Args:
-        media: Anki’s media manager.
 
-    Returns:
-        bool: True if the add-on has a newer asset version, False otherwise.
-    """
-    new_version = read_asset_version(plugin_assets / asset_version_file_name)
-    old_version = read_asset_version(
-        anki_media_directory(media) / asset_version_file_name)
-    if new_version is None:
-        return False
-    elif old_version is None or new_version > old_version:
-        return True
-    else:
-        return False
-
-
-def read_asset_version(asset_version: pathlib.Path) -> Optional[int]:
-    """Reads the integer representing the asset version from the file."""
+def file_stat(path: pathlib.Path) -> Optional[Tuple[int, int]]:
+    """Returns the file’s modification time and size if it exists."""
     try:
-        with open(asset_version, 'r') as f:
-            return int(f.read())
-    except Exception:
+        stat = path.stat()
+    except FileNotFoundError:
         return None
-
-
-def anki_media_directory(media: MediaManager) -> pathlib.Path:
-    return pathlib.Path(media.dir())
+    return stat.st_mtime_ns, stat.st_size
 
 
 def list_my_assets(dir: pathlib.Path, asset_prefix: str) -> List[str]:
+    """Lists assets in the directory. This scans the whole directory."""
     return [f for f in os.listdir(dir) if f.startswith(asset_prefix)]
 
 
-def install_media_assets(media: MediaManager, plugin_assets: pathlib.Path,
-                         asset_prefix) -> None:
-    my_assets = list_my_assets(plugin_assets, asset_prefix)
-    for asset in my_assets:
-        media.add_file(str(plugin_assets / asset))
+def present_media_assets(media_dir: pathlib.Path,
+                         assets: Iterable[str]) -> List[str]:
+    """Filters assets present in the media folder with targeted stat calls."""
+    return [asset for asset in assets if (media_dir / asset).exists()]
+
+
+def install_media_assets(media: MediaManager,
+                         plugin_assets: pathlib.Path,
+                         assets: Iterable[str],
+                         hash_cache: Optional[HashCache] = None) -> None:
+    """Installs assets into the media folder.
+
+    Assets are read and hashed concurrently, but registered in the media
+    database one at a time.
+
+    Args:
+        hash_cache: The cache to record hashes of installed assets in, so
+          that the next sync doesn’t hash them again.
+    """
+    media_dir = anki_media_directory(media)
+    for asset in prepare_assets(plugin_assets, assets):
+        name = media.write_data(asset.name, asset.data)
+        # Anki renames files that clash with existing ones.
+        if hash_cache is not None and name == asset.name:
+            hash_cache.record(media_dir / name, asset.entry)
+
+
+def delete_media_assets(media: MediaManager, assets: List[str]) -> None:
+    if assets:
+        media.trash_files(assets)
+
+
+@functools.cache
+def guard_registry(guards: Guards) -> GuardRegistry:
+    """Returns the registry of the add-on's guards, built once per guards."""
+    return GuardRegistry([guards])
+
+
+def template_reconfigurer(external_css: List[str],
+                          guard: str) -> StringTransformer:
+    """Returns a transformer that replaces the add-on's imports in a template.
 
+    Without external CSS, the imports are only deleted.
+    """
+    if len(external_css) == 0:
+        return lambda tmpl: delete_import_statements(guard, tmpl)
+    return lambda tmpl: append_import_statements(external_css, [], guard, tmpl)
+
+
+def style_configurer(
+        internal_css: str,
+        guard: str,
+        imported_css: Optional[List[str]] = None,
+        note_markup: Optional[NoteMarkup] = None) -> StringTransformer:
+    """Returns a transformer that adds the add-on's styles to a model's CSS.
+
+    Args:
+        internal_css: CSS appended to the model's CSS.
+        guard: The guard string.
+        imported_css: CSS assets imported at the top of the model's CSS.
+        note_markup: If given, the internal CSS is tree-shaken for each model
+          against the markup of its templates and notes.
+    """
+    guards = guard_css_comments(guard)
+
+    def configurer(internal_css: str) -> StringTransformer:
 
-def delete_media_assets(media: MediaManager, asset_prefix) -> None:
-    my_assets = list_my_assets(anki_media_directory(media), asset_prefix)
-    media.trash_files(my_assets)
+        def configure_style(css: str) -> str:
+            if imported_css:
+                css = prepend_css_imports(imported_css, guard, css)
+            if internal_css:
+                css = append_guarded_snippet(css, internal_css, guards)
+            return css
 
+        return configure_style
 
-def configure_cards(models: ModelModifier, external_css: List[str],
-                    internal_css: str, guard: str) -> None:
+    if note_markup is None or not internal_css:
+        return configurer(internal_css)
 
-    if len(external_css) > 0:
-        models.modify_templates(lambda tmpl: append_import_statements(
-            external_css, [], guard, tmpl))
+    def for_model(model: NotetypeDict) -> StringTransformer:
+        markup = scan_markup(tmpl[side] for tmpl in model['tmpls']
+                             for side in ('qfmt', 'afmt'))
+        return configurer(
+            tree_shake(internal_css, markup.union(note_markup(model['id']))))
 
-    if len(internal_css) > 0:
+    return ModelAwareTransformer(configurer(internal_css), for_model)
 
-        def modify_styles(tmpl):
-            return append_guarded_snippet(tmpl, internal_css,
-                                          guard_css_comments(guard))
 
-        models.modify_styles(modify_styles)
+def style_clearer(guard: str) -> StringTransformer:
+    """Returns a transformer that removes the add-on's styles."""
+    return guard_registry(guard_css_comments(guard)).delete
 
 
-def clear_cards(models: ModelModifier, guard: str) -> None:
-    models.modify_templates(lambda tmpl: delete_import_statements(guard, tmpl))
-    models.modify_styles(
-        lambda tmpl: delete_guarded_snippet(tmpl, guard_css_comments(guard)))
+def reconfigurers(
+    external_css: List[str],
+    internal_css: str,
+    guard: str,
+    imported_css: Optional[List[str]] = None,
+    note_markup: Optional[NoteMarkup] = None
+) -> Tuple[StringTransformer, StringTransformer]:
+    """Returns transformers that clear and configure templates and styles."""
+    return (template_reconfigurer(external_css, guard),
+            compose(
+                style_clearer(guard),
+                style_configurer(internal_css, guard, imported_css,
+                                 note_markup)))
+
+
+def reconfigure_cards(
+        models: ModelModifier,
+        external_css: List[str],
+        internal_css: str,
+        guard: str,
+        model_ids: Optional[Iterable[int]] = None,
+        imported_css: Optional[List[str]] = None,
+        note_markup: Optional[NoteMarkup] = None) -> ModificationReport:
+    """Clears and configures cards in a single pass over models.
+
+    Each model is loaded and saved only once. Reconfiguring without styles
+    clears cards.
+
+    Args:
+        model_ids: The models to reconfigure. All models by default.
+        imported_css: CSS assets imported at the top of each model's CSS.
+        note_markup: Enables tree-shaking of internal CSS, see
+          `style_configurer`.
+    """
+    template_f, style_f = reconfigurers(external_css, internal_css, guard,
+                                        imported_css, note_markup)
+    return models.modify(template_f, style_f, model_ids=model_ids)
 
 
 # Code related to guarding.
@@ -140,6 +571,8 @@ def append_import_statements(css_assets: List[str], js_assets: List[str],
     """
     Appends import statements to a card template.
 
+    Import statements appended before get replaced.
+
     :param css_assets List[str]
     :param js_assets List[str]
     :param guard str A guard string used for HTML comments wrapping the imports.
@@ -151,7 +584,25 @@ def append_import_statements(css_assets: List[str], js_assets: List[str],
         for css_asset in css_assets
     ] + [f'<script src="{js_asset}"></script>\n' for js_asset in js_assets]))
     guards = guard_html_comments(guard)
-    return append_guarded_snippet(tmpl, IMPORT_STATEMENTS, guards)
+    return guard_registry(guards).replace(tmpl, {guards: IMPORT_STATEMENTS})
+
+
+def prepend_css_imports(css_assets: List[str], guard: str, css: str) -> str:
+    """
+    Prepends @import rules to a model's CSS.
+
+    Browsers ignore @import rules that follow other rules, so the rules go
+    to the top.
+
+    :param css_assets List[str]
+    :param guard str A guard string used for CSS comments wrapping the rules.
+    :param css str The CSS to modify.
+    :rtype str: The CSS with added @import rules.
+    """
+    IMPORT_RULES = ''.join(
+        [f'@import url("{css_asset}");\n' for css_asset in css_assets])
+    return prepend_guarded_snippet(css, IMPORT_RULES,
+                                   guard_css_comments(guard))
 
 
 def delete_import_statements(guard: str, tmpl: str) -> str:
@@ -163,13 +614,38 @@ def delete_import_statements(guard: str, tmpl: str) -> str:
     :param tmpl str
     :rtype str: A template with deleted import statements.
     """
-    return delete_guarded_snippet(tmpl, guard_html_comments(guard))
+    return guard_registry(guard_html_comments(guard)).delete(tmpl)
 
 
-def sync_assets(has_newer_version: Callable[[], bool],
-                asset_manager: AssetManager) -> None:
-    """Checks if assets need updating and updates them."""
-    if not has_newer_version():
-        return None
-    asset_manager.delete_assets()
-    asset_manager.install_assets()
+def sync_assets(
+    asset_manager: AssetManager,
+    progress: Optional[ProgressCallback] = None,
+    report: Optional[SyncReport] = None,
+    transaction: Optional[Callable[[],
+                                   ContextManager[Any]]] = None) -> SyncPlan:
+    """Checks if assets and cards need updating and updates them.
+
+    Args:
+        asset_manager: The asset manager.
+        progress: An optional callback receiving labels of sync phases. It
+          gets called on the thread running the sync.
+        report: The report to record wall times of sync phases in.
+        transaction: Creates the context to make changes in, e.g., an undo
+          step. It is only entered if the sync changes anything.
+
+    Returns:
+        The applied plan.
+    """
+    with timed(report, 'total'):
+        if progress:
+            progress('Checking assets and cards…')
+        with timed(report, 'plan_sync'):
+            plan = asset_manager.plan_sync()
+        # Even an empty plan is applied to save caches.
+        if progress and not plan.is_empty():
+            progress('Updating assets and cards…')
+        context = (transaction() if transaction and not plan.is_empty() else
+                   contextlib.nullcontext())
+        with timed(report, 'apply_plan'), context:
+            asset_manager.apply_plan(plan)
+    return plan
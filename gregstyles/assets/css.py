@@ -0,0 +1,358 @@
+"""This module bundles, minifies, and tree-shakes CSS.
+
+It only depends on the standard library, so that the packaging script can run
+it directly to bundle styles:
+
+    python3 gregstyles/assets/css.py OUTPUT INPUT...
+"""
+import pathlib
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import (
+    AbstractSet,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Match,
+    Optional,
+    Set,
+)
+
+__all__ = [
+    'Markup',
+    'bundle',
+    'embed_urls',
+    'file_urls',
+    'minify',
+    'scan_markup',
+    'split_statements',
+    'strip_comments',
+    'tree_shake',
+]
+
+# Whitespace around these characters is insignificant. "+" and "(" are left
+# out because of calc() and media queries.
+_TIGHT = frozenset('{};,>~')
+
+
+def _string_end(css: str, start: int) -> int:
+    """Returns the index after the string literal starting at start."""
+    quote = css[start]
+    i = start + 1
+    while i < len(css):
+        if css[i] == '\\':
+            i += 2
+            continue
+        if css[i] == quote:
+            return i + 1
+        i += 1
+    return len(css)
+
+
+def strip_comments(css: str) -> str:
+    parts: List[str] = []
+    i = 0
+    while i < len(css):
+        c = css[i]
+        if c in '"\'':
+            end = _string_end(css, i)
+            parts.append(css[i:end])
+            i = end
+        elif css.startswith('/*', i):
+            end = css.find('*/', i + 2)
+            i = len(css) if end == -1 else end + 2
+            # A comment separates tokens like whitespace does.
+            parts.append(' ')
+        else:
+            parts.append(c)
+            i += 1
+    return ''.join(parts)
+
+
+def _collapse_whitespace(css: str) -> str:
+    out: List[str] = []
+    pending_space = False
+    i = 0
+    while i < len(css):
+        c = css[i]
+        if c.isspace():
+            pending_space = True
+            i += 1
+            continue
+        if pending_space:
+            pending_space = False
+            if out and out[-1] not in _TIGHT and out[-1] != ':' and (
+                    c not in _TIGHT):
+                out.append(' ')
+        if c in '"\'':
+            end = _string_end(css, i)
+            out.append(css[i:end])
+            i = end
+            continue
+        if c == '}' and out and out[-1] == ';':
+            out.pop()
+        out.append(c)
+        i += 1
+    return ''.join(out)
+
+
+def split_statements(css: str) -> List[str]:
+    """Splits CSS without comments into top-level rules and at-rules."""
+    statements: List[str] = []
+    depth = 0
+    start = 0
+    i = 0
+    while i < len(css):
+        c = css[i]
+        if c in '"\'':
+            i = _string_end(css, i)
+            continue
+        if c == '{':
+            depth += 1
+        elif c == '}':
+            depth = max(depth - 1, 0)
+            if depth == 0:
+                statements.append(css[start:i + 1].strip())
+                start = i + 1
+        elif c == ';' and depth == 0:
+            statements.append(css[start:i + 1].strip())
+            start = i + 1
+        i += 1
+    if css[start:].strip():
+        statements.append(css[start:].strip())
+    return [statement for statement in statements if statement]
+
+
+def _deduplicate(statements: List[str]) -> List[str]:
+    """Drops earlier copies of identical blocks.
+
+    The last copy wins the cascade anyway. Statements without blocks, like
+    @import, keep their position.
+    """
+    last_index = {
+        statement: i
+        for i, statement in enumerate(statements) if statement.endswith('}')
+    }
+    return [
+        statement for i, statement in enumerate(statements)
+        if not statement.endswith('}') or last_index[statement] == i
+    ]
+
+
+def minify(css: str) -> str:
+    """Strips comments, collapses whitespace, and drops duplicate rules."""
+    return ''.join(
+        _deduplicate(
+            split_statements(_collapse_whitespace(strip_comments(css)))))
+
+
+def bundle(styles: Iterable[str]) -> str:
+    """Concatenates and minifies styles."""
+    return minify('\n'.join(styles))
+
+
+# Classes and ids that Anki adds around rendered cards or that its filters,
+# e.g., cloze, hint, and type, generate.
+ANKI_CLASSES = frozenset([
+    'android', 'card', 'cloze', 'cloze-inactive', 'hint', 'ipad', 'iphone',
+    'isMac', 'isWin', 'linux', 'mac', 'mobile', 'night-mode', 'nightMode',
+    'night_mode', 'replay-button', 'soundLink', 'typeBad', 'typeGood',
+    'typeMissed', 'win'
+])
+ANKI_CLASS_PATTERNS = [re.compile(r'card\d+')]
+ANKI_IDS = frozenset(['qa', 'typeans'])
+
+_CLASS_ATTRIBUTE = re.compile(
+    r'\bclass\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.IGNORECASE)
+_ID_ATTRIBUTE = re.compile(r'\bid\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))',
+                           re.IGNORECASE)
+_PSEUDO = re.compile(r'::?[a-zA-Z-]+')
+_SIMPLE_SELECTOR = re.compile(r'([.#]?)(-?[_a-zA-Z][\w-]*)')
+
+
+@dataclass
+class Markup:
+    """Classes and ids that markup can contain.
+
+    None stands for markup that can contain any, e.g., because a script or
+    a template tag generates them.
+    """
+    classes: Optional[Set[str]] = field(default_factory=set)
+    ids: Optional[Set[str]] = field(default_factory=set)
+
+    def has_class(self, name: str) -> bool:
+        return (self.classes is None or name in self.classes
+                or name in ANKI_CLASSES
+                or any(p.fullmatch(name) for p in ANKI_CLASS_PATTERNS))
+
+    def has_id(self, name: str) -> bool:
+        return self.ids is None or name in self.ids or name in ANKI_IDS
+
+    def union(self, other: 'Markup') -> 'Markup':
+        """Returns markup that can contain what either markup can."""
+        return Markup(classes=_union(self.classes, other.classes),
+                      ids=_union(self.ids, other.ids))
+
+
+def _union(a: Optional[Set[str]], b: Optional[Set[str]]) -> Optional[Set[str]]:
+    return None if a is None or b is None else a | b
+
+
+def _add_attribute_values(pattern: re.Pattern, html: str,
+                          names: Optional[Set[str]]) -> Optional[Set[str]]:
+    if names is None:
+        return None
+    for match in pattern.finditer(html):
+        value = next(group for group in match.groups() if group is not None)
+        if '{{' in value:
+            return None
+        names.update(value.split())
+    return names
+
+
+def scan_markup(html_parts: Iterable[str]) -> Markup:
+    """Collects classes and ids that the HTML can contain."""
+    markup = Markup()
+    for html in html_parts:
+        if '<script' in html.lower():
+            return Markup(classes=None, ids=None)
+        markup.classes = _add_attribute_values(_CLASS_ATTRIBUTE, html,
+                                               markup.classes)
+        markup.ids = _add_attribute_values(_ID_ATTRIBUTE, html, markup.ids)
+    return markup
+
+
+def _split_top_level(text: str, separator: str) -> List[str]:
+    """Splits text on separators outside of strings, brackets, and parens."""
+    parts: List[str] = []
+    depth = 0
+    start = 0
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if c in '"\'':
+            i = _string_end(text, i)
+            continue
+        if c in '([':
+            depth += 1
+        elif c in ')]':
+            depth = max(depth - 1, 0)
+        elif c == separator and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+        i += 1
+    parts.append(text[start:])
+    return parts
+
+
+def _strip_nested(selector: str) -> str:
+    """Removes arguments of pseudo-classes and attribute selectors.
+
+    Their content needn't be present for the selector to match, e.g.,
+    `:not(.a)`.
+    """
+    kept: List[str] = []
+    depth = 0
+    for c in selector:
+        if c in '([':
+            depth += 1
+        elif c in ')]':
+            depth = max(depth - 1, 0)
+        elif depth == 0:
+            kept.append(c)
+    return ''.join(kept)
+
+
+def can_match(selector: str, markup: Markup) -> bool:
+    """Checks conservatively if the selector can match the markup.
+
+    Elements can always match, because filters generate elements that the
+    markup doesn't show, e.g., `{{hint:Notes}}` renders a link.
+    """
+    if '\\' in selector or '"' in selector or "'" in selector:
+        return True
+    compound = _PSEUDO.sub('', _strip_nested(selector))
+    for kind, name in _SIMPLE_SELECTOR.findall(compound):
+        if kind == '.' and not markup.has_class(name):
+            return False
+        if kind == '#' and not markup.has_id(name):
+            return False
+    return True
+
+
+# At-rules whose blocks contain rules.
+_GROUPING_AT_RULES: AbstractSet[str] = frozenset(
+    ['@container', '@layer', '@media', '@supports'])
+
+
+def _shake_statements(statements: Iterable[str],
+                      markup: Markup) -> Iterator[str]:
+    for statement in statements:
+        if '{' not in statement:
+            yield statement
+            continue
+        prelude, block = statement.split('{', 1)
+        if prelude.startswith('@'):
+            if prelude.split(maxsplit=1)[0].lower() in _GROUPING_AT_RULES:
+                rules = list(
+                    _shake_statements(split_statements(block[:-1]), markup))
+                if rules:
+                    yield prelude + '{' + '\n'.join(rules) + '}'
+            else:
+                yield statement
+            continue
+        selectors = [
+            selector.strip() for selector in _split_top_level(prelude, ',')
+            if can_match(selector.strip(), markup)
+        ]
+        if selectors:
+            yield ','.join(selectors) + ' {' + block
+
+
+def tree_shake(css: str, markup: Markup) -> str:
+    """Drops rules that can't match any element of the markup.
+
+    Selectors are checked conservatively: a selector is dropped only if it
+    requires a class or id that the markup doesn't contain.
+    """
+    return '\n'.join(
+        _shake_statements(split_statements(strip_comments(css)), markup))
+
+
+_URL = re.compile(r'url\(\s*([\'"]?)([^\'")\s]+)\1\s*\)')
+
+
+def file_urls(css: str) -> List[str]:
+    """Lists files that url() references in the CSS, e.g., fonts."""
+    urls: List[str] = []
+    for match in _URL.finditer(css):
+        url = match.group(2)
+        if ':' not in url and url not in urls:
+            urls.append(url)
+    return urls
+
+
+def embed_urls(css: str, uris: Mapping[str, str]) -> str:
+    """Replaces url() references to the files with their data URIs."""
+
+    def embed(match: Match[str]) -> str:
+        uri = uris.get(match.group(2))
+        return match.group(0) if uri is None else f'url("{uri}")'
+
+    return _URL.sub(embed, css)
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) < 3:
+        print(f'Usage: {argv[0]} OUTPUT INPUT...', file=sys.stderr)
+        return 1
+    output = pathlib.Path(argv[1])
+    output.write_text(
+        bundle(pathlib.Path(path).read_text() for path in argv[2:]) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,170 @@
+"""This module plans how assets reach cards.
+
+An asset can be copied into the styling of every note type (inline), embedded
+into inline styles as a data URI, or served from the media folder. Copies
+grow the collection database with every note type, while each media file is
+another request when a card renders and another file to sync. The planner
+trades these off by the size of each asset and the number of note types that
+would carry it.
+
+It only depends on the standard library.
+"""
+import base64
+import mimetypes
+import os.path
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping, Optional
+
+__all__ = [
+    'DATA_URI',
+    'DELIVERY_MODES',
+    'INLINE',
+    'MEDIA',
+    'DeliveryDecision',
+    'DeliveryPlan',
+    'data_uri',
+    'plan_delivery',
+]
+
+INLINE = 'inline'
+DATA_URI = 'data-uri'
+MEDIA = 'media'
+
+# Values of the style_delivery option. "auto" lets the planner decide.
+DELIVERY_MODES = ['auto', 'inline', 'import']
+
+# Stylesheets up to this size may be copied into each note type...
+INLINE_CSS_LIMIT = 32 * 1024
+# ...as long as all copies together stay under this size.
+INLINE_TOTAL_LIMIT = 1024 * 1024
+# Near INLINE_TOTAL_LIMIT, stylesheets keep their previous delivery until
+# their copies pass the limit by this fraction of it, so that adding or
+# removing a note type at the limit doesn't rewrite every note type.
+INLINE_TOTAL_MARGIN = 0.25
+# Assets that inline styles reference are embedded up to this size. Base64
+# grows them by a third.
+DATA_URI_LIMIT = 4 * 1024
+
+# Types that mimetypes doesn’t know on every platform.
+MIME_TYPES = {
+    '.otf': 'font/otf',
+    '.svg': 'image/svg+xml',
+    '.ttf': 'font/ttf',
+    '.woff': 'font/woff',
+    '.woff2': 'font/woff2',
+}
+
+
+@dataclass
+class DeliveryDecision:
+    """How an asset reaches cards and why."""
+    delivery: str
+    size: int
+    reason: str
+
+    def format(self) -> str:
+        return f'{self.delivery}, {self.size} B, {self.reason}'
+
+
+@dataclass
+class DeliveryPlan:
+    """Delivery decisions for each of the add-on’s assets."""
+    decisions: Dict[str, DeliveryDecision] = field(default_factory=dict)
+
+    def assets(self, delivery: str) -> List[str]:
+        """Lists assets with the delivery in plan order."""
+        return [
+            asset for asset, decision in self.decisions.items()
+            if decision.delivery == delivery
+        ]
+
+    def format(self) -> str:
+        return '\n'.join(f'{asset}: {decision.format()}'
+                         for asset, decision in self.decisions.items())
+
+
+def inline_total_limit(previous: Optional[str]) -> int:
+    """Returns the size limit of a stylesheet’s copies after a delivery."""
+    if previous == INLINE:
+        return int(INLINE_TOTAL_LIMIT * (1 + INLINE_TOTAL_MARGIN))
+    if previous == MEDIA:
+        return int(INLINE_TOTAL_LIMIT * (1 - INLINE_TOTAL_MARGIN))
+    return INLINE_TOTAL_LIMIT
+
+
+def plan_delivery(
+        style_assets: List[str],
+        sizes: Mapping[str, int],
+        references: Mapping[str, List[str]],
+        model_count: int,
+        mode: str = 'auto',
+        previous: Optional[Mapping[str, str]] = None) -> DeliveryPlan:
+    """Decides how each asset reaches cards.
+
+    Args:
+        style_assets: Stylesheets that every styled note type uses, in order.
+        sizes: Sizes of all assets.
+        references: Assets referenced from each stylesheet, e.g., fonts.
+        model_count: The number of styled note types.
+        mode: One of DELIVERY_MODES. "inline" and "import" force the delivery
+          of stylesheets.
+        previous: The previous delivery of stylesheets, if known.
+
+    Returns:
+        The plan. Stylesheets get inline or media delivery, assets
+        referenced only by inline stylesheets may get embedded, and all other
+        assets are served from media.
+    """
+    if mode not in DELIVERY_MODES:
+        raise ValueError(f'Unknown style delivery: {mode}.')
+    plan = DeliveryPlan()
+    copies = max(model_count, 1)
+    for style in style_assets:
+        size = sizes[style]
+        total_limit = inline_total_limit((previous or {}).get(style))
+        if mode == 'inline':
+            plan.decisions[style] = DeliveryDecision(INLINE, size,
+                                                     'forced by config')
+        elif mode == 'import':
+            plan.decisions[style] = DeliveryDecision(MEDIA, size,
+                                                     'forced by config')
+        elif size > INLINE_CSS_LIMIT:
+            plan.decisions[style] = DeliveryDecision(
+                MEDIA, size, f'larger than {INLINE_CSS_LIMIT} B')
+        elif size * copies > total_limit:
+            plan.decisions[style] = DeliveryDecision(
+                MEDIA, size, f'{copies} copies exceed {total_limit} B')
+        else:
+            plan.decisions[style] = DeliveryDecision(
+                INLINE, size, f'copied into {copies} note types')
+    referrers: Dict[str, List[str]] = {}
+    for style in style_assets:
+        for asset in references.get(style, []):
+            referrers.setdefault(asset, []).append(style)
+    for asset, size in sizes.items():
+        if asset in plan.decisions:
+            continue
+        styles = referrers.get(asset, [])
+        if styles and all(plan.decisions[style].delivery == INLINE
+                          for style in styles):
+            if size <= DATA_URI_LIMIT:
+                plan.decisions[asset] = DeliveryDecision(
+                    DATA_URI, size, f'embedded in {", ".join(styles)}')
+            else:
+                plan.decisions[asset] = DeliveryDecision(
+                    MEDIA, size, f'larger than {DATA_URI_LIMIT} B')
+        elif styles:
+            plan.decisions[asset] = DeliveryDecision(
+                MEDIA, size, 'referenced by served stylesheets')
+        else:
+            plan.decisions[asset] = DeliveryDecision(
+                MEDIA, size, 'not referenced by styles')
+    return plan
+
+
+def data_uri(name: str, data: bytes) -> str:
+    """Encodes the asset as a base64 data URI."""
+    mime_type = (MIME_TYPES.get(os.path.splitext(name)[1].lower())
+                 or mimetypes.guess_type(name)[0]
+                 or 'application/octet-stream')
+    return f'data:{mime_type};base64,{base64.b64encode(data).decode("ascii")}'
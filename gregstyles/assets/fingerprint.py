@@ -0,0 +1,93 @@
+"""This module caches fingerprints of models that the add-on has configured.
+
+A fingerprint consists of a model's modification stamp and a hash of the
+content that the add-on manages in the model. If neither has changed since
+the add-on has configured the model, the model needs no attention.
+"""
+import hashlib
+import json
+import pathlib
+from typing import Dict, Iterable, List, Tuple
+
+__all__ = ['ModelCache', 'ModelStamp', 'content_hash']
+
+# A model's modification time and update sequence number.
+ModelStamp = Tuple[int, int]
+
+
+def content_hash(*parts: str) -> str:
+    """Hashes the content that the add-on manages in models."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ModelCache:
+    """A persistent cache of fingerprints of configured models."""
+
+    def __init__(self, path: pathlib.Path) -> None:
+        """
+        Args:
+            path: The cache file. It doesn’t need to exist.
+        """
+        self.path = path
+        self.entries: Dict[int, Tuple[ModelStamp, str]] = self._read()
+
+    def _read(self) -> Dict[int, Tuple[ModelStamp, str]]:
+        try:
+            with open(self.path, 'r') as f:
+                raw = json.load(f)
+            return {
+                int(mid):
+                ((int(entry['mtime']), int(entry['usn'])), str(entry['hash']))
+                for mid, entry in raw.items()
+            }
+        except (OSError, ValueError, TypeError, KeyError, AttributeError):
+            return {}
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'w') as f:
+            json.dump(
+                {
+                    str(mid): {
+                        'mtime': stamp[0],
+                        'usn': stamp[1],
+                        'hash': chash
+                    }
+                    for mid, (stamp, chash) in self.entries.items()
+                },
+                f,
+                indent=2,
+                sort_keys=True)
+
+    def stale_models(self, stamps: Dict[int, ModelStamp],
+                     chash: str) -> List[int]:
+        """Lists models whose fingerprint doesn’t match the cached one.
+
+        Args:
+            stamps: Current stamps of all models.
+            chash: The hash of the content that the add-on currently manages.
+        """
+        return [
+            mid for mid, stamp in stamps.items()
+            if self.entries.get(mid) != (stamp, chash)
+        ]
+
+    def update(self, stamps: Dict[int, ModelStamp], chash: str,
+               model_ids: Iterable[int]) -> None:
+        """Records that the models are configured with the content.
+
+        Also forgets models that no longer exist.
+
+        Args:
+            stamps: Current stamps of all models.
+            chash: The hash of the content that the add-on currently manages.
+            model_ids: The configured models.
+        """
+        for mid in model_ids:
+            self.entries[mid] = (stamps[mid], chash)
+        for mid in [mid for mid in self.entries if mid not in stamps]:
+            del self.entries[mid]
@@ -1,6 +1,18 @@
 """This module handles guarding strings."""
+import os.path
 import re
-from typing import Tuple
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Match,
+    Optional,
+    Pattern,
+    Set,
+    Tuple,
+)
 
 Guards = Tuple[str, str]
 
@@ -53,15 +65,195 @@ def append_guarded_snippet(tmpl: str, snippet: str, guards: Guards) -> str:
     return tmpl + gap + GUARD_BEGIN + snippet + GUARD_END
 
 
+def prepend_guarded_snippet(tmpl: str, snippet: str, guards: Guards) -> str:
+    """
+    Prepends a guarded snippet to a string.
+
+    Leading newlines of the string are replaced with a single gap, so that
+    prepending after deleting the snippet is idempotent.
+
+    :param tmpl str The string to modify.
+    :param snippet str The snippet to prepend.
+    :param guards Tuple[str, str] The guard strings.
+    :rtype str: The modified string.
+    """
+    GUARD_BEGIN, GUARD_END = guards
+    return GUARD_BEGIN + snippet + GUARD_END + '\n' + tmpl.lstrip('\n')
+
+
+def split_guarded_snippets(tmpl: str, guards: Guards) -> Iterator[str]:
+    """Splits a string into the parts outside of guarded snippets.
+
+    This is a single linear scan. A snippet spans from a begin guard to the
+    nearest end guard. Newlines preceding a snippet belong to the snippet.
+    A begin guard without a matching end guard is not a snippet.
+
+    Args:
+        tmpl: The string to split.
+        guards: The guard strings.
+
+    Returns:
+        The parts of the string outside of guarded snippets, in order.
+    """
+    GUARD_BEGIN, GUARD_END = guards
+    pos = 0
+    while True:
+        begin = tmpl.find(GUARD_BEGIN, pos)
+        if begin == -1:
+            break
+        end = tmpl.find(GUARD_END, begin + len(GUARD_BEGIN))
+        if end == -1:
+            break
+        yield tmpl[pos:begin].rstrip('\n')
+        pos = end + len(GUARD_END)
+    yield tmpl[pos:]
+
+
 def delete_guarded_snippet(tmpl: str, guards: Guards) -> str:
     """
-    Deletes a guarded snippet from a string.
+    Deletes guarded snippets from a string.
+
+    Each snippet and the newlines preceding it get replaced with a single
+    newline.
 
     :param tmpl str The string to modify.
     :param guards Tuple[str, str] The guard strings.
     :rtype str: The modified string.
     """
-    return re.sub(f'(\n)*{re.escape(guards[0])}.*{re.escape(guards[1])}',
-                  '\n',
-                  tmpl,
-                  flags=re.MULTILINE | re.DOTALL)
+    if guards[0] not in tmpl:
+        return tmpl
+    return join_unguarded_parts(split_guarded_snippets(tmpl, guards))
+
+
+def join_unguarded_parts(parts: Iterator[str]) -> str:
+    """Joins parts around deleted snippets with single newlines.
+
+    Snippets at the start of the string take the newlines that follow them,
+    so that deleting a prepended snippet undoes prepending it.
+    """
+    result = [next(parts)]
+    at_start = not result[0]
+    for part in parts:
+        if at_start:
+            part = part.lstrip('\n')
+            at_start = not part
+        # Adjacent snippets collapse into a single newline.
+        elif part or result[-1]:
+            result.append('\n')
+        result.append(part)
+    return ''.join(result)
+
+
+class GuardRegistry:
+    """Guards of several add-ons that manage snippets in the same strings.
+
+    The registry handles snippets of all its guards in a single scan of a
+    string with a combined matcher of begin guards, so that the cost per
+    string stays flat as add-ons are added. Snippets of different guards must
+    not overlap.
+    """
+
+    def __init__(self, guards: Iterable[Guards] = ()) -> None:
+        self.guards: List[Guards] = []
+        self._ends: Dict[str, str] = {}
+        self._matcher: Optional[Pattern[str]] = None
+        self._prefix = ''
+        for pair in guards:
+            self.register(pair)
+
+    def register(self, guards: Guards) -> None:
+        """Adds a guard pair.
+
+        Raises:
+            ValueError: The begin guard is already registered.
+        """
+        if guards[0] in self._ends:
+            raise ValueError(f'The guard {guards[0]!r} is already registered.')
+        self.guards.append(guards)
+        self._ends[guards[0]] = guards[1]
+        self._matcher = None
+        # Guards made by guard_comments share a prefix, which str.find
+        # locates faster than the combined matcher.
+        self._prefix = os.path.commonprefix(list(self._ends))
+
+    def matcher(self) -> Pattern[str]:
+        if self._matcher is None:
+            # Longer guards go first, so that they win over their prefixes.
+            begins = sorted(self._ends, key=len, reverse=True)
+            self._matcher = re.compile('|'.join(map(re.escape, begins)))
+        return self._matcher
+
+    def search(self, tmpl: str, pos: int = 0) -> Optional[Match[str]]:
+        """Finds the first begin guard at or after the position."""
+        matcher = self.matcher()
+        if not self._prefix:
+            return matcher.search(tmpl, pos)
+        while True:
+            pos = tmpl.find(self._prefix, pos)
+            if pos == -1:
+                return None
+            match = matcher.match(tmpl, pos)
+            if match is not None:
+                return match
+            pos += 1
+
+    def split(self, tmpl: str) -> Iterator[str]:
+        """Splits a string into the parts outside of all guarded snippets.
+
+        This works like split_guarded_snippets for each guard, but scans the
+        string once.
+        """
+        if not self.guards:
+            yield tmpl
+            return
+        # Begin guards without an end guard after them aren't snippets.
+        unterminated: Set[str] = set()
+        pos = search_pos = 0
+        while True:
+            match = self.search(tmpl, search_pos)
+            if match is None:
+                break
+            begin = match.group()
+            end = (-1 if begin in unterminated else tmpl.find(
+                self._ends[begin], match.end()))
+            if end == -1:
+                unterminated.add(begin)
+                search_pos = match.start() + 1
+                continue
+            yield tmpl[pos:match.start()].rstrip('\n')
+            pos = search_pos = end + len(self._ends[begin])
+        yield tmpl[pos:]
+
+    def delete(self, tmpl: str) -> str:
+        """Deletes snippets of all guards like delete_guarded_snippet.
+
+        Adjacent snippets are treated alike, even if their guards differ.
+        """
+        if len(self.guards) == 1:
+            # A single guard needs no combined matcher.
+            return delete_guarded_snippet(tmpl, self.guards[0])
+        parts = list(self.split(tmpl))
+        if len(parts) == 1:
+            return tmpl
+        return join_unguarded_parts(iter(parts))
+
+    def replace(self, tmpl: str, snippets: Mapping[Guards, str]) -> str:
+        """Replaces snippets of all guards with the given ones.
+
+        Snippets of guards without a given one are deleted. Given snippets
+        are appended in registration order. On strings that the registry has
+        configured before, this gives the same result as deleting and
+        appending the snippet of each guard in turn.
+
+        Args:
+            tmpl: The string to modify.
+            snippets: Maps registered guards to their new snippets.
+        """
+        parts = [self.delete(tmpl)]
+        for guards in self.guards:
+            if guards in snippets:
+                parts += [
+                    '\n' if parts[-1].endswith('\n') else '\n\n', guards[0],
+                    snippets[guards], guards[1]
+                ]
+        return ''.join(parts)
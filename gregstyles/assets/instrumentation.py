@@ -0,0 +1,66 @@
+"""This module measures what a sync does and how long it takes."""
+import contextlib
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, Optional
+
+from .model import ModificationReport
+
+__all__ = ['SyncReport', 'timed']
+
+
+@dataclass
+class SyncReport:
+    """Statistics of a single sync."""
+    # Wall time of each phase in seconds.
+    phases: Dict[str, float] = field(default_factory=dict)
+    models_visited: int = 0
+    models_saved: int = 0
+    template_bytes_rewritten: int = 0
+    css_bytes_rewritten: int = 0
+    media_added: int = 0
+    media_trashed: int = 0
+    # Describes how each asset reaches cards.
+    deliveries: Dict[str, str] = field(default_factory=dict)
+
+    @contextlib.contextmanager
+    def span(self, phase: str) -> Iterator[None]:
+        """Adds the wall time of the enclosed code to the phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[phase] = (self.phases.get(phase, 0.0) +
+                                  time.perf_counter() - start)
+
+    def add_modification(self, report: ModificationReport) -> None:
+        self.models_visited += len(report.modified) + len(report.unmodified)
+        self.models_saved += len(report.modified)
+        self.template_bytes_rewritten += report.template_bytes
+        self.css_bytes_rewritten += report.css_bytes
+
+    def format(self) -> str:
+        """Formats the report as human-readable text."""
+        lines = [
+            f'{phase}: {seconds * 1e3:.1f} ms'
+            for phase, seconds in self.phases.items()
+        ]
+        lines += [
+            f'Models visited: {self.models_visited}',
+            f'Models saved: {self.models_saved}',
+            f'Template bytes rewritten: {self.template_bytes_rewritten}',
+            f'CSS bytes rewritten: {self.css_bytes_rewritten}',
+            f'Media files added: {self.media_added}',
+            f'Media files trashed: {self.media_trashed}',
+        ]
+        lines += [
+            f'Delivery of {asset}: {delivery}'
+            for asset, delivery in self.deliveries.items()
+        ]
+        return '\n'.join(lines)
+
+
+def timed(report: Optional[SyncReport],
+          phase: str) -> contextlib.AbstractContextManager:
+    """Times the phase if there is a report to record it in."""
+    return report.span(phase) if report else contextlib.nullcontext()
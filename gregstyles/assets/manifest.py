@@ -0,0 +1,289 @@
+"""This module handles asset manifests.
+
+A manifest maps each asset file name to a hash and the size of the file's
+content. The add-on ships a manifest of its assets and keeps a copy of the
+last installed manifest in the media folder, so that a sync can touch only
+the assets that have actually changed.
+
+This module only depends on the standard library, so that the packaging
+script can run it directly to generate the manifest:
+
+    python3 gregstyles/assets/manifest.py ASSET_DIR ASSET_PREFIX MANIFEST_NAME
+"""
+import collections
+import hashlib
+import json
+import os
+import pathlib
+import sys
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+
+class AssetEntry(NamedTuple):
+    sha256: str
+    size: int
+
+
+Manifest = Dict[str, AssetEntry]
+
+# An entry that differs from the entry of any real file.
+UNKNOWN_ENTRY = AssetEntry(sha256='', size=-1)
+# The default number of threads that read and hash assets.
+# The number of threads that hash assets when building a manifest.
+HASH_WORKERS = 4
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+__all__ = [
+    'UNKNOWN_ENTRY',
+    'AssetDiff',
+    'AssetEntry',
+    'HashCache',
+    'Manifest',
+    'asset_entry',
+    'build_manifest',
+    'diff_manifests',
+    'dumps_manifest',
+    'hash_file',
+    'map_bounded',
+    'read_manifest',
+    'write_manifest',
+]
+
+
+def map_bounded(f: Callable[[T], R],
+                items: Iterable[T],
+                max_workers: int = HASH_WORKERS) -> Iterator[R]:
+    """Maps items in a thread pool and yields results in order.
+
+    At most twice as many results as workers are held at once, so that memory
+    use stays bounded however many items there are.
+    """
+    if max_workers <= 1:
+        yield from map(f, items)
+        return
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending: Deque[Future[R]] = collections.deque()
+        for item in items:
+            if len(pending) >= 2 * max_workers:
+                yield pending.popleft().result()
+            pending.append(pool.submit(f, item))
+        while pending:
+            yield pending.popleft().result()
+
+
+def hash_file(path: pathlib.Path) -> str:
+    """Returns the SHA-256 hex digest of the file's content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def asset_entry(path: pathlib.Path) -> AssetEntry:
+    return AssetEntry(sha256=hash_file(path), size=path.stat().st_size)
+
+
+class HashCache:
+    """A cache of file hashes keyed by file name, size, and mtime.
+
+    Files that haven't changed since they were hashed don't get hashed again.
+    """
+
+    def __init__(self, path: Optional[pathlib.Path] = None) -> None:
+        """
+        Args:
+            path: The cache file. It doesn’t need to exist. Without a path,
+              the cache lives only in memory.
+        """
+        self.path = path
+        # Maps a file name to its size, mtime in nanoseconds, and hash.
+        self.entries: Dict[str, Tuple[int, int, str]] = self._read()
+        self.dirty = False
+
+    def _read(self) -> Dict[str, Tuple[int, int, str]]:
+        if self.path is None:
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                raw = json.load(f)
+            return {
+                str(name): (int(entry['size']), int(entry['mtime_ns']),
+                            str(entry['sha256']))
+                for name, entry in raw.items()
+            }
+        except (OSError, ValueError, TypeError, KeyError, AttributeError):
+            return {}
+
+    def save(self) -> None:
+        if self.path is None or not self.dirty:
+            return None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'w') as f:
+            json.dump(
+                {
+                    name: {
+                        'size': size,
+                        'mtime_ns': mtime_ns,
+                        'sha256': sha256
+                    }
+                    for name, (size, mtime_ns, sha256) in self.entries.items()
+                },
+                f,
+                indent=2,
+                sort_keys=True)
+        self.dirty = False
+
+    def entry(self,
+              path: pathlib.Path,
+              expected: Optional[AssetEntry] = None) -> Optional[AssetEntry]:
+        """Describes the file, hashing it only if it's new to the cache.
+
+        Args:
+            path: The file.
+            expected: The entry the file should have. If the file's size
+              differs from it, the file is not hashed and gets an unknown
+              hash.
+
+        Returns:
+            The file's entry or None if the file doesn't exist.
+        """
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        if expected is not None and expected.size != stat.st_size:
+            return AssetEntry(sha256=UNKNOWN_ENTRY.sha256, size=stat.st_size)
+        cached = self.entries.get(path.name)
+        if cached is None or cached[:2] != (stat.st_size, stat.st_mtime_ns):
+            cached = (stat.st_size, stat.st_mtime_ns, hash_file(path))
+            self.entries[path.name] = cached
+            self.dirty = True
+        return AssetEntry(sha256=cached[2], size=stat.st_size)
+
+    def record(self, path: pathlib.Path, entry: AssetEntry) -> None:
+        """Records the entry of a file that was just written.
+
+        This spares hashing the file on its next lookup.
+        """
+        stat = path.stat()
+        if stat.st_size != entry.size:
+            return None
+        self.entries[path.name] = (stat.st_size, stat.st_mtime_ns,
+                                   entry.sha256)
+        self.dirty = True
+
+
+def build_manifest(asset_dir: pathlib.Path, asset_prefix: str,
+                   manifest_name: str) -> Manifest:
+    """Hashes all assets in the directory.
+
+    Args:
+        asset_dir: The directory containing assets.
+        asset_prefix: The prefix shared by all assets.
+        manifest_name: The manifest's file name, which is skipped.
+
+    Returns:
+        The manifest of the directory's assets.
+    """
+    names = [
+        name for name in sorted(os.listdir(asset_dir))
+        if name.startswith(asset_prefix) and name != manifest_name
+    ]
+    # Hashing releases the GIL, so threads hash large assets in parallel.
+    return dict(
+        zip(names,
+            map_bounded(asset_entry, (asset_dir / name for name in names))))
+
+
+def read_manifest(path: pathlib.Path) -> Optional[Manifest]:
+    """Reads a manifest file.
+
+    Returns:
+        The manifest or None if the file doesn't exist or is malformed.
+    """
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict):
+        return None
+    entries: Manifest = {}
+    for name, entry in manifest.items():
+        if not (isinstance(entry, dict)
+                and isinstance(entry.get('sha256'), str)
+                and isinstance(entry.get('size'), int)):
+            return None
+        entries[name] = AssetEntry(sha256=entry['sha256'], size=entry['size'])
+    return entries
+
+
+def dumps_manifest(manifest: Manifest) -> str:
+    return json.dumps(
+        {
+            name: entry._asdict()
+            for name, entry in manifest.items()
+        },
+        indent=2,
+        sort_keys=True) + '\n'
+
+
+def write_manifest(manifest: Manifest, path: pathlib.Path) -> None:
+    with open(path, 'w') as f:
+        f.write(dumps_manifest(manifest))
+
+
+@dataclass
+class AssetDiff:
+    """Asset files that differ between two manifests."""
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+    def is_empty(self) -> bool:
+        return not (self.added or self.changed or self.removed)
+
+    def touches(self, assets: Iterable[str]) -> bool:
+        """Checks if any of the assets is added, changed, or removed."""
+        touched = set(self.added) | set(self.changed) | set(self.removed)
+        return any(asset in touched for asset in assets)
+
+
+def diff_manifests(old: Manifest, new: Manifest) -> AssetDiff:
+    """Computes the changes needed to go from the old to the new manifest."""
+    return AssetDiff(added=sorted(name for name in new if name not in old),
+                     changed=sorted(name for name in new
+                                    if name in old and old[name] != new[name]),
+                     removed=sorted(name for name in old if name not in new))
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) != 4:
+        print(f'Usage: {argv[0]} ASSET_DIR ASSET_PREFIX MANIFEST_NAME',
+              file=sys.stderr)
+        return 1
+    asset_dir, asset_prefix, manifest_name = (pathlib.Path(argv[1]), argv[2],
+                                              argv[3])
+    write_manifest(build_manifest(asset_dir, asset_prefix, manifest_name),
+                   asset_dir / manifest_name)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -1,34 +1,416 @@
 """This module handles Anki models."""
-from typing import Callable, Protocol
+import copy
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Protocol,
+    Tuple,
+)
 
 from anki.collection import ModelManager
+from anki.models import NotetypeDict, NotetypeId
+
+from .fingerprint import ModelStamp
 
 StringTransformer = Callable[[str], str]
 
 
+def identity(s: str) -> str:
+    return s
+
+
+class ModelAwareTransformer:
+    """A string transformer that can specialize for the model it transforms.
+
+    Model modifiers specialize it for each model after transforming the
+    model's templates. Called directly, it applies the fallback, which must
+    be correct for any model.
+    """
+
+    def __init__(self, fallback: StringTransformer,
+                 for_model: Callable[[NotetypeDict], StringTransformer]):
+        self.fallback = fallback
+        self.for_model = for_model
+
+    def __call__(self, s: str) -> str:
+        return self.fallback(s)
+
+
+def specialize(f: StringTransformer, model: NotetypeDict) -> StringTransformer:
+    return f.for_model(model) if isinstance(f, ModelAwareTransformer) else f
+
+
+def compose(*fs: StringTransformer) -> StringTransformer:
+    """Composes transformers, applying them from left to right.
+
+    The composition is model-aware if any of the transformers is.
+    """
+
+    def composition(s: str) -> str:
+        for f in fs:
+            s = f(s)
+        return s
+
+    if not any(isinstance(f, ModelAwareTransformer) for f in fs):
+        return composition
+    return ModelAwareTransformer(
+        composition,
+        lambda model: compose(*(specialize(f, model) for f in fs)))
+
+
+@dataclass
+class ModificationReport:
+    """Names of models that a modification has changed and left untouched."""
+    modified: List[str] = field(default_factory=list)
+    unmodified: List[str] = field(default_factory=list)
+    # UTF-8 sizes of rewritten template sides and CSS.
+    template_bytes: int = 0
+    css_bytes: int = 0
+
+
+# The parts of a model that transformers change: its CSS and the question and
+# answer formats of its templates.
+ModelContent = Tuple[str, List[Tuple[str, str]]]
+
+
+@dataclass
+class ModelChange:
+    """How a modification changes a model."""
+    id: int
+    name: str
+    # The model's stamp before the change.
+    stamp: ModelStamp
+    # The changed parts of the model: "qfmt", "afmt", and "css".
+    parts: List[str] = field(default_factory=list)
+    # UTF-8 sizes of rewritten template sides and CSS.
+    template_bytes: int = 0
+    css_bytes: int = 0
+    # The change of the UTF-8 size of the model's templates and CSS.
+    byte_delta: int = 0
+    # The model's templates and CSS after the change.
+    content: Optional[ModelContent] = None
+
+
+def utf8_size(s: str) -> int:
+    return len(s.encode('utf-8'))
+
+
+def transform_model(model: NotetypeDict, template_f: StringTransformer,
+                    style_f: StringTransformer) -> Optional[ModelChange]:
+    """Transforms the model in place.
+
+    Returns:
+        The change or None if the model has stayed the same.
+    """
+    change = ModelChange(id=model['id'],
+                         name=model['name'],
+                         stamp=(model['mod'], model['usn']))
+    for tmpl in model['tmpls']:
+        for side in ('qfmt', 'afmt'):
+            new_side = template_f(tmpl[side])
+            if new_side != tmpl[side]:
+                if side not in change.parts:
+                    change.parts.append(side)
+                change.template_bytes += utf8_size(new_side)
+                change.byte_delta += utf8_size(new_side) - utf8_size(
+                    tmpl[side])
+                tmpl[side] = new_side
+    new_css = specialize(style_f, model)(model['css'])
+    if new_css != model['css']:
+        change.parts.append('css')
+        change.css_bytes += utf8_size(new_css)
+        change.byte_delta += utf8_size(new_css) - utf8_size(model['css'])
+        model['css'] = new_css
+    if not change.parts:
+        return None
+    change.content = model_content(model)
+    return change
+
+
+def model_content(model: NotetypeDict) -> ModelContent:
+    return model['css'], [(tmpl['qfmt'], tmpl['afmt'])
+                          for tmpl in model['tmpls']]
+
+
+def set_model_content(model: NotetypeDict, content: ModelContent) -> None:
+    """Sets the content of the model in place."""
+    model['css'], sides = content
+    for tmpl, (qfmt, afmt) in zip(model['tmpls'], sides):
+        tmpl['qfmt'], tmpl['afmt'] = qfmt, afmt
+
+
+@dataclass(frozen=True)
+class ModelInfo:
+    """What a model selector sees of a model without loading it."""
+    id: int
+    name: str
+    field_names: Tuple[str, ...] = ()
+    template_names: Tuple[str, ...] = ()
+
+
+ModelPredicate = Callable[[ModelInfo], bool]
+
+# Called with the number of processed models and the number of all models.
+ModelProgressCallback = Callable[[int, int], None]
+
+
+@dataclass
+class ModelSelector:
+    """Selects models by name glob, id, or predicate.
+
+    A model is selected if it matches any of the given criteria. A selector
+    without criteria selects all models.
+    """
+    name_globs: List[str] = field(default_factory=list)
+    ids: List[int] = field(default_factory=list)
+    # Field and template names are read only for selectors with a predicate.
+    predicate: Optional[ModelPredicate] = None
+
+    def selects_all(self) -> bool:
+        return not (self.name_globs or self.ids or self.predicate)
+
+    def selects(self, info: ModelInfo) -> bool:
+        return (self.selects_all() or any(
+            fnmatchcase(info.name, glob) for glob in self.name_globs)
+                or info.id in self.ids
+                or (self.predicate is not None and self.predicate(info)))
+
+
 class ModelModifier(Protocol):
     """The streamlined interface for Anki models (card types)."""
 
-    def modify_templates(self, f: StringTransformer) -> None:
+    def modify_templates(self, f: StringTransformer) -> ModificationReport:
         pass
 
-    def modify_styles(self, f: StringTransformer) -> None:
+    def modify(
+            self,
+            template_f: StringTransformer,
+            style_f: StringTransformer,
+            model_ids: Optional[Iterable[int]] = None) -> ModificationReport:
+        """Modifies templates and styles of each model in a single pass.
+
+        Each model is loaded once and saved only if its content has changed.
+
+        Args:
+            template_f: The transformer applied to each template side.
+            style_f: The transformer applied to each model's CSS.
+            model_ids: The models to modify. All models by default.
+
+        Returns:
+            The models that have been changed and left untouched.
+        """
+        pass
+
+    def plan(self,
+             template_f: StringTransformer,
+             style_f: StringTransformer,
+             model_ids: Optional[Iterable[int]] = None) -> List[ModelChange]:
+        """Computes the changes that modify would make without saving them.
+
+        Returns:
+            The changes of models that modify would change.
+        """
+        pass
+
+    def apply(self, changes: List[ModelChange]) -> ModificationReport:
+        """Saves the planned content of changed models.
+
+        Each model is loaded once and nothing gets transformed again, so the
+        saved models are exactly as planned. The caller checks that the
+        models haven't changed since planning, e.g., by their stamps.
+
+        Returns:
+            The models that have been changed.
+        """
+        pass
+
+    def model_stamps(self) -> Dict[int, ModelStamp]:
+        """Reads modification stamps of all models without loading them."""
         pass
 
 
 class AnkiModelModifier(ModelModifier):
+    """A model modifier of the models picked by the selector.
 
-    def __init__(self, model_manager: ModelManager):
+    The modifier loads, transforms, and saves one model at a time, so that
+    its memory use doesn’t grow with the collection. Modifications are all or
+    nothing: if one fails, the models saved before it are restored.
+    """
+
+    def __init__(self,
+                 model_manager: ModelManager,
+                 selector: Optional[ModelSelector] = None,
+                 progress: Optional[ModelProgressCallback] = None):
         self.model_manager: ModelManager = model_manager
+        self.selector = selector or ModelSelector()
+        self.progress = progress
+
+    def modify_templates(self, f: StringTransformer) -> ModificationReport:
+        return self.modify(f, identity)
+
+    def modify(
+            self,
+            template_f: StringTransformer,
+            style_f: StringTransformer,
+            model_ids: Optional[Iterable[int]] = None) -> ModificationReport:
+        report = ModificationReport()
+        # Only the original content of saved models is kept for rollback.
+        saved: List[Tuple[int, ModelContent]] = []
+        try:
+            for model in self.models(model_ids):
+                content = model_content(model)
+                change = transform_model(model, template_f, style_f)
+                if change:
+                    self.model_manager.save(model)
+                    saved.append((change.id, content))
+                    report.modified.append(change.name)
+                    report.template_bytes += change.template_bytes
+                    report.css_bytes += change.css_bytes
+                else:
+                    report.unmodified.append(model['name'])
+        except BaseException:
+            self.restore(saved)
+            raise
+        return report
+
+    def restore(self, saved: List[Tuple[int, ModelContent]]) -> None:
+        """Restores the original content of saved models."""
+        for mid, content in reversed(saved):
+            model = self.load(mid)
+            if model is not None:
+                set_model_content(model, content)
+                self.model_manager.save(model)
+
+    def plan(self,
+             template_f: StringTransformer,
+             style_f: StringTransformer,
+             model_ids: Optional[Iterable[int]] = None) -> List[ModelChange]:
+        changes = []
+        for model in self.models(model_ids):
+            change = transform_model(model, template_f, style_f)
+            if change:
+                changes.append(change)
+        return changes
+
+    def apply(self, changes: List[ModelChange]) -> ModificationReport:
+        report = ModificationReport()
+        saved: List[Tuple[int, ModelContent]] = []
+        try:
+            for done, change in enumerate(changes, start=1):
+                assert change.content is not None, (
+                    f'The change of {change.name} has no content.')
+                model = self.load(change.id)
+                if model is not None:
+                    model = copy.deepcopy(model)
+                    content = model_content(model)
+                    set_model_content(model, change.content)
+                    self.model_manager.save(model)
+                    saved.append((change.id, content))
+                    report.modified.append(change.name)
+                    report.template_bytes += change.template_bytes
+                    report.css_bytes += change.css_bytes
+                if self.progress:
+                    self.progress(done, len(changes))
+        except BaseException:
+            self.restore(saved)
+            raise
+        return report
+
+    def models(
+            self,
+            model_ids: Optional[Iterable[int]] = None
+    ) -> Iterator[NotetypeDict]:
+        """Loads copies of the selected models one at a time.
+
+        Args:
+            model_ids: The models to load if selected. All selected models by
+              default.
+        """
+        selected_ids = self.selected_model_ids()
+        if selected_ids is not None:
+            selected = set(selected_ids)
+            model_ids = (selected_ids if model_ids is None else
+                         [mid for mid in model_ids if mid in selected])
+        if model_ids is None:
+            model_ids = [
+                entry.id for entry in self.model_manager.all_names_and_ids()
+            ]
+        model_ids = list(model_ids)
+        # Load one model at a time instead of materializing all of them.
+        for done, mid in enumerate(model_ids, start=1):
+            model = self.load(mid)
+            if model is not None:
+                # ModelManager.get may return its cached dict, which must
+                # only change when the model is saved.
+                yield copy.deepcopy(model)
+            if self.progress:
+                self.progress(done, len(model_ids))
+
+    def load(self, mid: int) -> Optional[NotetypeDict]:
+        """Loads a model without growing ModelManager's cache.
+
+        ModelManager.get caches every model it loads, so a model that wasn't
+        cached before gets evicted again.
+        """
+        ntid = NotetypeId(mid)
+        cached = self.model_manager._get_cached(ntid) is not None
+        model = self.model_manager.get(ntid)
+        if not cached:
+            self.model_manager._remove_from_cache(ntid)
+        return model
+
+    def model_stamps(self) -> Dict[int, ModelStamp]:
+        db = self.model_manager.col.db
+        assert db is not None, 'The collection is closed.'
+        selected_ids = self.selected_model_ids()
+        selected = None if selected_ids is None else set(selected_ids)
+        return {
+            mid: (mtime, usn)
+            for mid, mtime, usn in db.execute(
+                'select id, mtime_secs, usn from notetypes')
+            if selected is None or mid in selected
+        }
+
+    def selected_model_count(self) -> int:
+        selected_ids = self.selected_model_ids()
+        if selected_ids is None:
+            return len(self.model_manager.all_names_and_ids())
+        return len(selected_ids)
+
+    def selected_model_ids(self) -> Optional[List[int]]:
+        """Selects models without loading them.
+
+        Returns:
+            The ids of the selected models or None if all are selected.
+        """
+        if self.selector.selects_all():
+            return None
+        return [
+            info.id for info in self.model_infos()
+            if self.selector.selects(info)
+        ]
 
-    def modify_templates(self, f: StringTransformer) -> None:
-        for model in self.model_manager.all():
-            for tmpl in model['tmpls']:
-                tmpl['afmt'] = f(tmpl['afmt'])
-                tmpl['qfmt'] = f(tmpl['qfmt'])
-            self.model_manager.save(model)
-
-    def modify_styles(self, f: StringTransformer) -> None:
-        for model in self.model_manager.all():
-            model['css'] = f(model['css'])
-            self.model_manager.save(model)
+    def model_infos(self) -> List[ModelInfo]:
+        field_names: Dict[int, List[str]] = {}
+        template_names: Dict[int, List[str]] = {}
+        if self.selector.predicate is not None:
+            db = self.model_manager.col.db
+            assert db is not None, 'The collection is closed.'
+            for names, table in ((field_names, 'fields'), (template_names,
+                                                           'templates')):
+                for mid, name in db.execute(
+                        f'select ntid, name from {table} order by ntid, ord'):
+                    names.setdefault(mid, []).append(name)
+        return [
+            ModelInfo(id=entry.id,
+                      name=entry.name,
+                      field_names=tuple(field_names.get(entry.id, [])),
+                      template_names=tuple(template_names.get(entry.id, [])))
+            for entry in self.model_manager.all_names_and_ids()
+        ]
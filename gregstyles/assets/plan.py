@@ -0,0 +1,72 @@
+"""This module describes sync plans.
+
+A sync plan lists the changes that a sync would make and estimates their
+cost. Computing a plan writes nothing, so expensive rollouts can be previewed,
+e.g., on a copy of a collection, and then applied exactly as previewed.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from .fingerprint import ModelStamp
+from .manifest import AssetDiff
+from .model import ModelChange
+
+__all__ = ['OutdatedPlanError', 'SyncPlan']
+
+
+class OutdatedPlanError(Exception):
+    """The collection has changed since the plan was computed."""
+
+
+@dataclass
+class SyncPlan:
+    """The changes that a sync would make."""
+    diff: AssetDiff = field(default_factory=AssetDiff)
+    # Sizes in bytes of media files that would be written, the manifest
+    # included.
+    media_added: Dict[str, int] = field(default_factory=dict)
+    media_trashed: List[str] = field(default_factory=list)
+    model_changes: List[ModelChange] = field(default_factory=list)
+    # Stamps of the models that were checked, changed or not.
+    model_stamps: Dict[int, ModelStamp] = field(default_factory=dict)
+    # The hash of the content that the add-on manages in models.
+    content_hash: str = ''
+
+    def is_empty(self) -> bool:
+        return not (self.media_added or self.media_trashed
+                    or self.model_changes)
+
+    @property
+    def model_saves(self) -> int:
+        return len(self.model_changes)
+
+    @property
+    def model_bytes(self) -> int:
+        """UTF-8 bytes of templates and CSS that would be rewritten."""
+        return sum(change.template_bytes + change.css_bytes
+                   for change in self.model_changes)
+
+    @property
+    def media_bytes(self) -> int:
+        """Bytes of media files that would be written and uploaded."""
+        return sum(self.media_added.values())
+
+    def format(self) -> str:
+        """Formats the plan as human-readable text."""
+        lines = [
+            f'Note type {change.name}: {", ".join(change.parts)} '
+            f'({change.byte_delta:+d} B)' for change in self.model_changes
+        ]
+        lines += [
+            f'Add media file {name} ({size} B)'
+            for name, size in self.media_added.items()
+        ]
+        lines += [f'Trash media file {name}' for name in self.media_trashed]
+        lines += [
+            f'Note types saved: {self.model_saves}',
+            f'Template and CSS bytes rewritten: {self.model_bytes}',
+            (f'Media files added: {len(self.media_added)} '
+             f'({self.media_bytes} B to upload)'),
+            f'Media files trashed: {len(self.media_trashed)}',
+        ]
+        return '\n'.join(lines)
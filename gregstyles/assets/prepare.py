@@ -0,0 +1,41 @@
+"""This module prepares assets for installation concurrently.
+
+Reading and hashing files release the GIL, so a small thread pool overlaps
+them across large assets. Anki’s media database is not thread-safe, so
+prepared assets still get registered one at a time.
+"""
+import hashlib
+import pathlib
+from typing import Iterable, Iterator, NamedTuple
+
+from .manifest import HASH_WORKERS, AssetEntry, map_bounded
+
+__all__ = ['PreparedAsset', 'prepare_assets']
+
+
+class PreparedAsset(NamedTuple):
+    """An asset read into memory and hashed."""
+    name: str
+    data: bytes
+    entry: AssetEntry
+
+
+def prepare_asset(path: pathlib.Path) -> PreparedAsset:
+    data = path.read_bytes()
+    return PreparedAsset(name=path.name,
+                         data=data,
+                         entry=AssetEntry(
+                             sha256=hashlib.sha256(data).hexdigest(),
+                             size=len(data)))
+
+
+def prepare_assets(directory: pathlib.Path,
+                   assets: Iterable[str],
+                   max_workers: int = HASH_WORKERS) -> Iterator[PreparedAsset]:
+    """Reads and hashes assets in the directory in a bounded thread pool.
+
+    Yields:
+        The prepared assets in the given order.
+    """
+    return map_bounded(prepare_asset, (directory / asset for asset in assets),
+                       max_workers)
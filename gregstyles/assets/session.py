@@ -0,0 +1,49 @@
+"""This module keeps state between syncs within an Anki session.
+
+Profiles can be opened and switched many times in a session. The state lets
+a sync skip reloading assets and, if nothing has changed since the last sync
+of a collection, skip the sync altogether.
+"""
+import pathlib
+from dataclasses import dataclass
+from typing import Callable, Generic, Optional, TypeVar
+
+from .fingerprint import ModelCache
+from .manifest import HashCache
+from .watch import Snapshot, snapshot
+
+__all__ = ['StatCache', 'SyncState']
+
+T = TypeVar('T')
+
+
+class StatCache(Generic[T]):
+    """Caches a value loaded from a directory until its files change.
+
+    Checking the cache costs a stat per file in the directory.
+    """
+
+    def __init__(self) -> None:
+        self.directory: Optional[pathlib.Path] = None
+        self.snapshot: Optional[Snapshot] = None
+        self.value: Optional[T] = None
+
+    def get(self, directory: pathlib.Path, load: Callable[[], T]) -> T:
+        """Returns the cached value or loads it if the directory changed."""
+        current = snapshot(directory)
+        if (self.value is None or directory != self.directory
+                or current != self.snapshot):
+            # Take the snapshot before loading, so that changes made while
+            # loading invalidate the value.
+            self.directory, self.snapshot = directory, current
+            self.value = load()
+        return self.value
+
+
+@dataclass
+class SyncState:
+    """What the session knows about a collection from earlier syncs."""
+    model_cache: ModelCache
+    hash_cache: HashCache
+    # The fingerprint of the state after the last successful sync.
+    fingerprint: Optional[str] = None
@@ -0,0 +1,99 @@
+"""This module watches asset files for changes during development.
+
+The watcher polls modification times from a background thread, which works
+on every platform without extra dependencies. Editors often save a file in
+several writes, so changes are reported only once the directory has been
+quiet for a moment.
+"""
+import os
+import pathlib
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+__all__ = ['AssetWatcher', 'Snapshot', 'changed_files', 'snapshot']
+
+# Maps a file name to its modification time in nanoseconds and size.
+Snapshot = Dict[str, Tuple[int, int]]
+
+
+def snapshot(directory: pathlib.Path) -> Snapshot:
+    """Reads modification times and sizes of files in the directory."""
+    files: Snapshot = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file():
+                stat = entry.stat()
+                files[entry.name] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+def changed_files(old: Snapshot, new: Snapshot) -> List[str]:
+    """Lists files that were added, removed, or modified."""
+    return sorted(name for name in old.keys() | new.keys()
+                  if old.get(name) != new.get(name))
+
+
+class AssetWatcher:
+    """Reports changed files in a directory after bursts of changes settle."""
+
+    def __init__(self,
+                 directory: pathlib.Path,
+                 on_change: Callable[[List[str]], None],
+                 interval: float = 0.1,
+                 debounce: float = 0.2) -> None:
+        """
+        Args:
+            directory: The watched directory.
+            on_change: The callback receiving names of changed files. It gets
+              called on the watcher's thread.
+            interval: Seconds between polls.
+            debounce: Seconds without changes after which changes get
+              reported.
+        """
+        self.directory = directory
+        self.on_change = on_change
+        self.interval = interval
+        self.debounce = debounce
+        self.snapshot = snapshot(directory)
+        self.pending: Set[str] = set()
+        self.last_change = 0.0
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def poll(self, now: float) -> None:
+        """Checks the directory once.
+
+        Args:
+            now: The current monotonic time.
+        """
+        try:
+            current = snapshot(self.directory)
+        except OSError:
+            # The directory may briefly disappear, e.g., during a checkout.
+            return None
+        changes = changed_files(self.snapshot, current)
+        if changes:
+            self.snapshot = current
+            self.pending.update(changes)
+            self.last_change = now
+        elif self.pending and now - self.last_change >= self.debounce:
+            changed = sorted(self.pending)
+            self.pending.clear()
+            self.on_change(changed)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run,
+                                        name='gregstyles-asset-watcher',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.poll(time.monotonic())
@@ -0,0 +1,180 @@
+"""This module syncs the add-on’s assets into collections without Anki’s GUI.
+
+It opens collections directly with the anki library and syncs them in
+parallel processes, so that many collections can be styled at once:
+
+    python3 -m gregstyles.batch --assets assets COLLECTION.anki2...
+
+Anki must not have the collections open.
+"""
+import argparse
+import json
+import os
+import pathlib
+import sys
+import textwrap
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from anki.collection import Collection
+
+from . import core
+from .assets import sync_assets
+from .assets.fingerprint import ModelCache
+from .assets.instrumentation import SyncReport
+from .assets.manifest import HashCache
+
+# Caches shared with the add-on when run from its directory.
+DEFAULT_CACHE_DIR = pathlib.Path(os.path.dirname(__file__)) / 'user_files'
+
+
+@dataclass
+class CollectionResult:
+    """The outcome of syncing one collection."""
+    path: str
+    seconds: float
+    # The sync report, or the sync plan in a dry run.
+    summary: str = ''
+    error: Optional[str] = None
+
+    def format(self) -> str:
+        status = f'failed: {self.error}' if self.error else 'done'
+        header = f'{self.path}: {status} in {self.seconds * 1e3:.1f} ms'
+        if not self.summary:
+            return header
+        return header + '\n' + textwrap.indent(self.summary, '  ')
+
+
+def sync_collection(path: str,
+                    config: Dict[str, Any],
+                    assets: core.PluginAssets,
+                    asset_dir: pathlib.Path,
+                    cache_dir: pathlib.Path,
+                    dry_run: bool = False) -> CollectionResult:
+    """Syncs assets of the collection at the path.
+
+    Errors are returned in the result, so that they don’t stop other syncs.
+
+    Args:
+        assets: The assets loaded from asset_dir.
+        cache_dir: The directory with model and hash caches.
+        dry_run: Whether to only plan the sync.
+    """
+    start = time.perf_counter()
+    if not os.path.isfile(path):
+        # Anki would create a new collection.
+        return CollectionResult(path, 0.0, error='No such collection.')
+    try:
+        col = Collection(path)
+        try:
+            report = SyncReport()
+            manager = core.asset_manager(
+                col,
+                config,
+                assets,
+                asset_dir,
+                model_cache=ModelCache(
+                    core.cache_path(cache_dir / 'model-cache', col)),
+                hash_cache=HashCache(
+                    core.cache_path(cache_dir / 'media-hash-cache', col)),
+                report=report)
+            if dry_run:
+                summary = manager.plan_sync().format()
+            else:
+                sync_assets(manager, report=report)
+                summary = report.format()
+        finally:
+            col.close()
+    except Exception as e:
+        return CollectionResult(path,
+                                time.perf_counter() - start,
+                                error=f'{type(e).__name__}: {e}')
+    return CollectionResult(path, time.perf_counter() - start, summary)
+
+
+def sync_collections(paths: List[str],
+                     config: Dict[str, Any],
+                     asset_dir: pathlib.Path,
+                     cache_dir: pathlib.Path,
+                     jobs: int,
+                     dry_run: bool = False) -> List[CollectionResult]:
+    """Syncs collections in a pool of processes.
+
+    Results are printed as syncs finish. Paths to the same collection are
+    synced once, so that no two processes open it.
+
+    Returns:
+        Results in the order of paths, without duplicates.
+    """
+    unique_paths: Dict[str, str] = {}
+    for path in paths:
+        unique_paths.setdefault(os.path.realpath(path), path)
+    paths = list(unique_paths.values())
+    assets = core.load_plugin_assets(asset_dir)
+    results: Dict[str, CollectionResult] = {}
+    with ProcessPoolExecutor(
+            max_workers=max(1, min(jobs, len(paths)))) as pool:
+        futures = [
+            pool.submit(sync_collection, path, config, assets, asset_dir,
+                        cache_dir, dry_run) for path in paths
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            print(result.format(), flush=True)
+            results[result.path] = result
+    return [results[path] for path in paths]
+
+
+def read_config(path: Optional[str]) -> Dict[str, Any]:
+    """Reads an add-on config file with defaults filled in."""
+    config: Dict[str, Any] = dict(core.DEFAULT_CONFIG)
+    if path is not None:
+        with open(path, 'r') as f:
+            config.update(json.load(f))
+    return config
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python3 -m gregstyles.batch',
+        description='Syncs Greg Styles assets into Anki collections.')
+    parser.add_argument('collections',
+                        metavar='COLLECTION',
+                        nargs='+',
+                        help='a collection file, e.g., collection.anki2')
+    parser.add_argument('--assets',
+                        type=pathlib.Path,
+                        default=DEFAULT_CACHE_DIR.parent / 'asset-files',
+                        help='the directory with assets to install')
+    parser.add_argument('--config',
+                        help='an add-on config file, see config.md')
+    parser.add_argument('--cache-dir',
+                        type=pathlib.Path,
+                        default=DEFAULT_CACHE_DIR,
+                        help='the directory with model and hash caches')
+    parser.add_argument('--jobs',
+                        type=int,
+                        default=os.cpu_count() or 1,
+                        help='the number of parallel processes')
+    parser.add_argument('--dry-run',
+                        action='store_true',
+                        help='print the changes without making them')
+    args = parser.parse_args(argv[1:])
+
+    start = time.perf_counter()
+    results = sync_collections(args.collections,
+                               read_config(args.config),
+                               args.assets,
+                               args.cache_dir,
+                               jobs=args.jobs,
+                               dry_run=args.dry_run)
+    failures = sum(1 for result in results if result.error)
+    print(f'Synced {len(results) - failures}/{len(results)} collections in '
+          f'{time.perf_counter() - start:.1f} s.')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,237 @@
+"""The add-on’s core that works without Anki’s GUI.
+
+It describes the add-on’s assets and builds asset managers of collections. Both
+the add-on and the headless batch sync use it.
+"""
+import hashlib
+import pathlib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from anki.collection import Collection
+
+from .assets import (
+    AnkiAssetManager,
+    NoteMarkup,
+    load_plugin_manifest,
+)
+from .assets.css import Markup, embed_urls, file_urls, scan_markup
+from .assets.delivery import (
+    DATA_URI,
+    DATA_URI_LIMIT,
+    INLINE,
+    MEDIA,
+    DeliveryPlan,
+    data_uri,
+    plan_delivery,
+)
+from .assets.fingerprint import ModelCache
+from .assets.instrumentation import SyncReport
+from .assets.manifest import HashCache, Manifest, map_bounded, read_manifest
+from .assets.model import (
+    AnkiModelModifier,
+    ModelProgressCallback,
+    ModelSelector,
+)
+
+# The guard used in templates to clearly mark the add-on's code.
+GUARD = 'Anki Greg Styles'
+PLUGIN_CLASS_NAME = 'greg-styles'
+ASSET_PREFIX = f'_{PLUGIN_CLASS_NAME}-'
+
+# The manifest is generated when packaging the add-on. Don’t keep it in assets.
+MANIFEST_FILE_NAME = f'{ASSET_PREFIX}manifest.json'
+EXTERNAL_STYLES: List[str] = []
+INTERNAL_STYLES = [f'{ASSET_PREFIX}main.css']
+# The minified bundle of INTERNAL_STYLES. It is generated when packaging the
+# add-on and replaces them in the package.
+BUNDLED_STYLES_FILE_NAME = f'{ASSET_PREFIX}bundle.min.css'
+
+# Keep in sync with config.json.
+DEFAULT_CONFIG: Dict[str, Any] = {
+    'background_sync': True,
+    'dev_asset_dir': None,
+    'note_type_ids': [],
+    'note_type_names': [],
+    'style_delivery': 'auto',
+    'sync_report': True,
+    'tree_shake_styles': False,
+}
+
+
+@dataclass
+class PluginAssets:
+    """The add-on’s assets loaded from its asset directory."""
+    manifest: Manifest
+    internal_styles: List[str]
+    # The content of each internal style.
+    styles: Dict[str, str]
+    # The content of assets that styles reference and that are small enough
+    # to be embedded.
+    embeddable: Dict[str, bytes]
+
+
+def internal_style_assets(asset_dir: pathlib.Path) -> List[str]:
+    """Returns the assets with internal styles.
+
+    A packaged add-on ships the minified bundle, a development checkout the
+    source styles.
+    """
+    if (asset_dir / BUNDLED_STYLES_FILE_NAME).exists():
+        return [BUNDLED_STYLES_FILE_NAME]
+    return INTERNAL_STYLES
+
+
+def load_plugin_assets(asset_dir: pathlib.Path) -> PluginAssets:
+    manifest = load_plugin_manifest(asset_dir, ASSET_PREFIX,
+                                    MANIFEST_FILE_NAME)
+    internal_styles = internal_style_assets(asset_dir)
+    styles = dict(
+        zip(
+            internal_styles,
+            map_bounded(pathlib.Path.read_text,
+                        [asset_dir / style for style in internal_styles])))
+    embeddable = {
+        asset: (asset_dir / asset).read_bytes()
+        for css in styles.values()
+        for asset in file_urls(css)
+        if asset in manifest and manifest[asset].size <= DATA_URI_LIMIT
+    }
+    return PluginAssets(manifest=manifest,
+                        internal_styles=internal_styles,
+                        styles=styles,
+                        embeddable=embeddable)
+
+
+def previous_delivery(col: Collection, assets: PluginAssets) -> Dict[str, str]:
+    """Reads the last delivery of internal styles from the media folder.
+
+    The installed manifest lists the assets served from media, so internal
+    styles missing from it were inlined. A sync that serves nothing from
+    media writes no manifest.
+    """
+    installed = read_manifest(
+        pathlib.Path(col.media.dir()) / MANIFEST_FILE_NAME) or {}
+    return {
+        style: MEDIA if style in installed else INLINE
+        for style in assets.internal_styles
+    }
+
+
+def delivery_plan(config: Dict[str, Any],
+                  assets: PluginAssets,
+                  model_count: int,
+                  previous: Optional[Dict[str, str]] = None) -> DeliveryPlan:
+    """Plans the delivery of assets to the given number of note types."""
+    return plan_delivery(
+        assets.internal_styles,
+        sizes={
+            asset: entry.size
+            for asset, entry in assets.manifest.items()
+        },
+        references={
+            style:
+            [asset for asset in file_urls(css) if asset in assets.manifest]
+            for style, css in assets.styles.items()
+        },
+        model_count=model_count,
+        mode=config['style_delivery'],
+        previous=previous)
+
+
+def model_selector(config: Dict[str, Any]) -> ModelSelector:
+    """Creates the selector of note types that the add-on styles."""
+    return ModelSelector(name_globs=config['note_type_names'],
+                         ids=config['note_type_ids'])
+
+
+def note_markup(col: Collection) -> NoteMarkup:
+    """Scans fields of notes of a note type.
+
+    Only fields that can add classes or ids are read, and each note type's
+    notes are scanned at most once.
+    """
+    scanned: Dict[int, Markup] = {}
+
+    def scan_fields(mid: int) -> Markup:
+        if mid not in scanned:
+            assert col.db is not None, 'The collection is closed.'
+            # LIKE is case-insensitive, like scan_markup.
+            scanned[mid] = scan_markup(
+                col.db.list(
+                    'select flds from notes where mid = ? and (flds like '
+                    "'%class%' or flds like '%id%' or flds like '%script%')",
+                    mid))
+        return scanned[mid]
+
+    return scan_fields
+
+
+def cache_path(cache_dir: pathlib.Path, col: Collection) -> pathlib.Path:
+    """Returns the path of the collection’s file in the cache directory."""
+    col_hash = hashlib.sha1(col.path.encode('utf-8')).hexdigest()
+    return cache_dir / f'{col_hash}.json'
+
+
+def asset_manager(
+        col: Collection,
+        config: Dict[str, Any],
+        assets: PluginAssets,
+        asset_dir: pathlib.Path,
+        model_cache: ModelCache,
+        hash_cache: HashCache,
+        report: Optional[SyncReport] = None,
+        progress: Optional[ModelProgressCallback] = None) -> AnkiAssetManager:
+    """Creates the asset manager of the collection.
+
+    Internal styles are either copied into each model’s CSS, where small
+    assets they reference get embedded and the styles can be tree-shaken for
+    each model, or served from the media folder and imported by each model’s
+    CSS. Only assets served from the media folder get installed there.
+
+    Args:
+        assets: The assets loaded from asset_dir.
+        report: Also receives the delivery decisions.
+    """
+    models = AnkiModelModifier(col.models, model_selector(config), progress)
+    auto = config['style_delivery'] == 'auto'
+    plan = delivery_plan(config, assets,
+                         models.selected_model_count() if auto else 0,
+                         previous_delivery(col, assets) if auto else None)
+    if report:
+        report.deliveries = {
+            asset: decision.format()
+            for asset, decision in plan.decisions.items()
+        }
+    inline_styles = plan.assets(INLINE)
+    embedded_assets = plan.assets(DATA_URI)
+    uris = {
+        asset: data_uri(asset, assets.embeddable[asset])
+        for asset in embedded_assets
+    }
+    internal_css = '\n'.join(
+        embed_urls(assets.styles[style], uris) for style in inline_styles)
+    return AnkiAssetManager(
+        models,
+        col.media,
+        external_css=EXTERNAL_STYLES,
+        internal_css=internal_css,
+        style_assets=EXTERNAL_STYLES + inline_styles + embedded_assets,
+        guard=GUARD,
+        plugin_assets=asset_dir,
+        asset_prefix=ASSET_PREFIX,
+        manifest_name=MANIFEST_FILE_NAME,
+        model_cache=model_cache,
+        imported_css=[
+            style for style in assets.internal_styles
+            if plan.decisions[style].delivery == MEDIA
+        ],
+        report=report,
+        hash_cache=hash_cache,
+        note_markup=note_markup(col)
+        if config['tree_shake_styles'] and internal_css else None,
+        plugin_manifest={
+            asset: entry
+            for asset, entry in assets.manifest.items()
+            if plan.decisions[asset].delivery == MEDIA
+        })
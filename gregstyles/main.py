@@ -1,74 +1,318 @@
 """The implementation of the greg styles add-on."""
-import functools
 import os
 import pathlib
-from typing import Callable, List
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
+from anki.collection import Collection, OpChanges
 from aqt import gui_hooks, mw
-from aqt.utils import showWarning
+from aqt.addons import AddonManager
+from aqt.main import AnkiQt
+from aqt.operations import CollectionOp
+from aqt.qt import QAction, qconnect
+from aqt.utils import showInfo, showText, showWarning, tooltip
 
-from .assets import AnkiAssetManager, has_newer_version, sync_assets
-from .assets.model import AnkiModelModifier
+from . import core
+from .assets import AnkiAssetManager, ProgressCallback, sync_assets
+from .assets.fingerprint import ModelCache
+from .assets.instrumentation import SyncReport, timed
+from .assets.manifest import HashCache
+from .assets.model import AnkiModelModifier, ModelProgressCallback
+from .assets.session import StatCache, SyncState
+from .assets.watch import AssetWatcher
+from .core import DEFAULT_CONFIG, PluginAssets, model_selector
 
 NEW_ISSUES_LINK = "https://github.com/gregorias/anki-greg-styles/issues/new."
 
-# The guard used in templates to clearly mark the add-on's code.
-GUARD = 'Anki Greg Styles'
-PLUGIN_CLASS_NAME = 'greg-styles'
-ASSET_PREFIX = f'_{PLUGIN_CLASS_NAME}-'
+# Names of undo steps of the add-on’s collection operations.
+SYNC_UNDO_NAME = 'Greg Styles Sync'
+REPAIR_UNDO_NAME = 'Greg Styles Repair'
 
-ASSET_VERSION_FILE_NAME = f'{ASSET_PREFIX}asset-version.txt'
-EXTERNAL_STYLES: List[str] = []
-INTERNAL_STYLES = [f'{ASSET_PREFIX}main.css']
+# The minimal interval in seconds between progress updates about note types.
+MODEL_PROGRESS_INTERVAL = 0.1
+
+logger = AddonManager.get_logger(__name__)
+
+# Whether the Tools menu has the add-on’s actions.
+menu_is_set_up = False
+
+# The report of the last sync in this session.
+last_sync_report: Optional[SyncReport] = None
 
 addon_path: pathlib.Path = pathlib.Path(os.path.dirname(__file__))
 
+# The watched directory with assets under development, if any.
+dev_asset_dir: Optional[pathlib.Path] = None
+asset_watcher: Optional[AssetWatcher] = None
+
+# The loaded plugin assets, reloaded when their files change.
+loaded_plugin_assets: StatCache[PluginAssets] = StatCache()
+
+# Sync states of collections keyed by profile name and collection path.
+sync_states: Dict[Tuple[str, str], SyncState] = {}
+
 
 def plugin_assets() -> pathlib.Path:
+    if dev_asset_dir is not None:
+        return dev_asset_dir
     return addon_path / 'asset-files'
 
 
-def read_internal_styles():
-    css_snippets = []
-    for style in INTERNAL_STYLES:
-        with open(plugin_assets() / style, 'r') as f:
-            css_snippets.append(f.read())
-    return "\n".join(css_snippets)
+def load_plugin_assets() -> PluginAssets:
+    return core.load_plugin_assets(plugin_assets())
 
 
 def modify_templates(modify: Callable[[str], str]) -> None:
-    """Modifies all card templates with modify."""
+    """Modifies card templates of the selected note types with modify."""
     if not mw:
         showWarning("Greg styles plugin tried to modify card templates " +
                     "but Anki's main window has not loaded up yet.\n" +
                     f"Please report this to the author at {NEW_ISSUES_LINK}.")
         return None
-    for model in mw.col.models.all():
-        for tmpl in model['tmpls']:
-            tmpl['afmt'] = modify(tmpl['afmt'])
-            tmpl['qfmt'] = modify(tmpl['qfmt'])
-        mw.col.models.save(model)
+    AnkiModelModifier(mw.col.models,
+                      model_selector(addon_config())).modify_templates(modify)
+
+
+def addon_config() -> Dict[str, Any]:
+    """Reads the add-on’s config with defaults filled in."""
+    config: Dict[str, Any] = dict(DEFAULT_CONFIG)
+    if mw:
+        config.update(mw.addonManager.getConfig(__name__) or {})
+    return config
+
+
+def model_progress(progress: ProgressCallback) -> ModelProgressCallback:
+    """Reports styled note types, throttled to spare the main thread."""
+    last_update = 0.0
+
+    def update(done: int, total: int) -> None:
+        nonlocal last_update
+        now = time.monotonic()
+        if done == total or now - last_update >= MODEL_PROGRESS_INTERVAL:
+            last_update = now
+            progress(f'Styling note types ({done}/{total})…')
+
+    return update
+
+
+def cache_path(col: Collection, cache: str) -> pathlib.Path:
+    """Returns the path of the collection’s cache file."""
+    return core.cache_path(addon_path / 'user_files' / cache, col)
+
+
+def sync_state(col: Collection) -> SyncState:
+    """Returns the session’s sync state of the collection.
+
+    The state outlives profile switches, so that reopening a profile reuses
+    caches loaded before.
+    """
+    key = ((mw.pm.name if mw else None) or '', col.path)
+    state = sync_states.get(key)
+    if state is None:
+        state = SyncState(
+            model_cache=ModelCache(cache_path(col, 'model-cache')),
+            hash_cache=HashCache(cache_path(col, 'media-hash-cache')))
+        sync_states[key] = state
+    return state
+
+
+class UndoStep:
+    """Merges the collection changes of the enclosed code into one undo step.
+
+    Each saved note type is an undoable operation of its own, which would
+    otherwise flood the undo queue.
+    """
+
+    def __init__(self, col: Collection, name: str) -> None:
+        self.col = col
+        self.name = name
+        self.target = 0
+        # The merged changes, which collection operations return.
+        self.changes = OpChanges()
+
+    def __enter__(self) -> None:
+        self.target = self.col.add_custom_undo_entry(self.name)
+
+    def __exit__(self, *_: object) -> None:
+        self.changes = self.col.merge_undo_entries(self.target)
+
+
+def anki_asset_manager(
+        col: Collection,
+        config: Dict[str, Any],
+        report: Optional[SyncReport] = None,
+        progress: Optional[ProgressCallback] = None) -> AnkiAssetManager:
+    """Creates the asset manager of the collection with session caches."""
+    state = sync_state(col)
+    return core.asset_manager(
+        col,
+        config,
+        loaded_plugin_assets.get(plugin_assets(), load_plugin_assets),
+        plugin_assets(),
+        model_cache=state.model_cache,
+        hash_cache=state.hash_cache,
+        report=report,
+        progress=model_progress(progress) if progress else None)
+
+
+def sync(
+    col: Collection,
+    config: Dict[str, Any],
+    progress: Optional[ProgressCallback] = None
+) -> Tuple[OpChanges, Optional[SyncReport]]:
+    """Syncs assets of the collection.
+
+    The sync is skipped if nothing it depends on has changed since the last
+    successful sync of the collection in this session. Changes are made in a
+    single undo step, which only gets added if there are changes.
+
+    Returns:
+        The collection changes and the sync report if enabled in the config.
+    """
+    report = SyncReport() if config['sync_report'] else None
+    state = sync_state(col)
+    manager = anki_asset_manager(col, config, report, progress)
+    with timed(report, 'fingerprint'):
+        fingerprint = manager.fingerprint()
+    if fingerprint == state.fingerprint:
+        return OpChanges(), report
+    state.fingerprint = None
+    step = UndoStep(col, SYNC_UNDO_NAME)
+    sync_assets(manager,
+                progress=progress,
+                report=report,
+                transaction=lambda: step)
+    state.fingerprint = manager.fingerprint()
+    return step.changes, report
+
+
+def on_synced(report: Optional[SyncReport]) -> None:
+    global last_sync_report
+    last_sync_report = report
+    if report:
+        logger.debug('Synced assets:\n%s', report.format())
+
+
+def show_last_sync_report() -> None:
+    if last_sync_report is None:
+        showInfo('Greg Styles has no sync report. Reports are recorded when ' +
+                 'the sync_report option is enabled.')
+        return None
+    showText(last_sync_report.format(), title='Greg Styles: last sync report')
+
+
+def sync_in_background(main_window: AnkiQt, config: Dict[str, Any]) -> None:
+    """Syncs assets in a background collection operation."""
+    report: Optional[SyncReport] = None
+
+    def update_progress(label: str) -> None:
+        main_window.taskman.run_on_main(
+            lambda: main_window.progress.update(label=f'Greg Styles: {label}'))
+
+    def on_failure(exception: Exception) -> None:
+        showWarning("Greg styles plugin failed to sync its assets:\n" +
+                    f"{exception}\n" +
+                    f"Please report this to the author at {NEW_ISSUES_LINK}.")
+
+    def op(col: Collection) -> OpChanges:
+        nonlocal report
+        changes, report = sync(col, config, progress=update_progress)
+        return changes
+
+    CollectionOp(parent=main_window, op=op).success(
+        lambda _: on_synced(report)).failure(on_failure).run_in_background()
+
+
+def resync_changed_assets(main_window: AnkiQt, config: Dict[str, Any],
+                          changed: List[str]) -> None:
+    """Syncs changed development assets and refreshes rendered cards."""
+    report: Optional[SyncReport] = None
+
+    def op(col: Collection) -> OpChanges:
+        nonlocal report
+        changes, report = sync(col, config)
+        # Note type changes make the reviewer and previewers rerender.
+        return changes
+
+    def on_success(_: OpChanges) -> None:
+        on_synced(report)
+        tooltip(f'Greg Styles: reloaded {", ".join(changed)}.')
+
+    CollectionOp(parent=main_window,
+                 op=op).success(on_success).run_in_background()
+
+
+def start_watching_assets(main_window: AnkiQt, config: Dict[str, Any]) -> None:
+    """Serves assets from the development directory and syncs their changes.
+
+    The watcher stops when the profile closes.
+    """
+    global dev_asset_dir, asset_watcher
+    directory = pathlib.Path(config['dev_asset_dir']).expanduser()
+    if not directory.is_dir():
+        showWarning(f'Greg Styles can’t watch {directory}, because it is ' +
+                    'not a directory.')
+        return None
+    dev_asset_dir = directory
+    asset_watcher = AssetWatcher(
+        dev_asset_dir, lambda changed: main_window.taskman.run_on_main(
+            lambda: resync_changed_assets(main_window, config, changed)))
+    asset_watcher.start()
+    gui_hooks.profile_will_close.append(stop_watching_assets)
+
 
+def stop_watching_assets() -> None:
+    global dev_asset_dir, asset_watcher
+    gui_hooks.profile_will_close.remove(stop_watching_assets)
+    if asset_watcher is not None:
+        asset_watcher.stop()
+    dev_asset_dir, asset_watcher = None, None
 
-def load_mw_and_sync() -> None:
+
+def repair_assets() -> None:
+    """Reinstalls all assets, scanning the media folder for stray ones."""
     main_window = mw
     if not main_window:
-        showWarning("Greg styles plugin tried to initialize but couldn't " +
-                    "find the main window.")
         return None
+    config = addon_config()
+
+    def op(col: Collection) -> OpChanges:
+        sync_state(col).fingerprint = None
+        step = UndoStep(col, REPAIR_UNDO_NAME)
+        with step:
+            anki_asset_manager(col, config).repair_assets()
+        return step.changes
 
-    anki_model_modifier = AnkiModelModifier(mw.col.models)
+    CollectionOp(parent=main_window, op=op).success(lambda _: tooltip(
+        'Greg Styles: assets repaired.')).run_in_background()
 
-    anki_asset_manager = AnkiAssetManager(anki_model_modifier,
-                                          main_window.col.media,
-                                          external_css=EXTERNAL_STYLES,
-                                          internal_css=read_internal_styles(),
-                                          guard=GUARD,
-                                          plugin_assets=plugin_assets(),
-                                          asset_prefix=ASSET_PREFIX)
-    sync_assets(
-        functools.partial(has_newer_version, mw.col.media, plugin_assets(),
-                          ASSET_VERSION_FILE_NAME), anki_asset_manager)
 
+def setup_menu(main_window: AnkiQt) -> None:
+    action = QAction('Repair Greg Styles assets', main_window)
+    qconnect(action.triggered, repair_assets)
+    main_window.form.menuTools.addAction(action)
+    action = QAction('Greg Styles sync report', main_window)
+    qconnect(action.triggered, show_last_sync_report)
+    main_window.form.menuTools.addAction(action)
+
+
+def on_profile_did_open() -> None:
+    """Sets up the menu on the first profile and syncs the profile’s assets."""
+    global menu_is_set_up
+    main_window = mw
+    if not main_window:
+        showWarning("Greg styles plugin tried to initialize but couldn't " +
+                    "find the main window.")
+        return None
+    if not menu_is_set_up:
+        setup_menu(main_window)
+        menu_is_set_up = True
 
-gui_hooks.profile_did_open.append(load_mw_and_sync)
+    config = addon_config()
+    if config['dev_asset_dir']:
+        start_watching_assets(main_window, config)
+    if config['background_sync']:
+        sync_in_background(main_window, config)
+    else:
+        _, report = sync(main_window.col, config)
+        on_synced(report)
@@ -0,0 +1,46 @@
+import hashlib
+import os
+import pathlib
+from typing import List
+
+__all__ = ['FakeMediaManager']
+
+
+class FakeMediaManager:
+    """A fake of Anki’s MediaManager that works on a real directory.
+
+    Like Anki, it renames added files that clash with existing files of
+    different content.
+    """
+
+    def __init__(self, media_dir: pathlib.Path) -> None:
+        self.media_dir = media_dir
+        self.added: List[str] = []
+        self.trashed: List[str] = []
+
+    def dir(self) -> str:
+        return str(self.media_dir)
+
+    def add_file(self, path: str) -> str:
+        with open(path, 'rb') as f:
+            return self.write_data(os.path.basename(path), f.read())
+
+    def write_data(self, desired_fname: str, data: bytes) -> str:
+        fname = desired_fname
+        target = self.media_dir / fname
+        if target.exists() and target.read_bytes() != data:
+            stem, ext = os.path.splitext(desired_fname)
+            fname = f'{stem}-{hashlib.sha1(data).hexdigest()}{ext}'
+            target = self.media_dir / fname
+        target.write_bytes(data)
+        self.added.append(fname)
+        return fname
+
+    def trash_files(self, fnames: List[str]) -> None:
+        for fname in fnames:
+            (self.media_dir / fname).unlink()
+        self.trashed.extend(fnames)
+
+    def clear_log(self) -> None:
+        self.added.clear()
+        self.trashed.clear()
@@ -1,24 +1,227 @@
-from typing import List
+import collections
+import copy
+from typing import (
+    Any,
+    Counter,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
 
-from gregstyles.assets.model import ModelModifier, StringTransformer
+from gregstyles.assets.fingerprint import ModelStamp
+from gregstyles.assets.model import (
+    ModelChange,
+    ModelModifier,
+    ModificationReport,
+    StringTransformer,
+    identity,
+)
 
-__all__ = 'FakeModelModifier'
+__all__ = ['FakeModelManager', 'FakeModelModifier']
+
+Model = Dict[str, Any]
+
+
+class NotetypeNameId(NamedTuple):
+    id: int
+    name: str
+
+
+class FakeDB:
+    """A fake of Anki’s DBProxy that answers the add-on’s model queries."""
+
+    def __init__(self, model_manager: 'FakeModelManager') -> None:
+        self.model_manager = model_manager
+        self.queries = 0
+
+    def execute(self, sql: str) -> List[Tuple[Any, ...]]:
+        self.queries += 1
+        models = self.model_manager.models
+        if sql == 'select id, mtime_secs, usn from notetypes':
+            return [(mid, model['mod'], model['usn'])
+                    for mid, model in models.items()]
+        if sql == 'select ntid, name from fields order by ntid, ord':
+            return [(mid, fld['name']) for mid, model in models.items()
+                    for fld in model['flds']]
+        assert sql == 'select ntid, name from templates order by ntid, ord'
+        return [(mid, tmpl['name']) for mid, model in models.items()
+                for tmpl in model['tmpls']]
+
+
+class FakeModelManager:
+    """A fake of Anki’s ModelManager that stores models in memory."""
+
+    def __init__(self) -> None:
+        self.models: Dict[int, Model] = {}
+        # Models that get returned, like ModelManager._cache.
+        self._cache: Dict[int, Model] = {}
+        self.loads = 0
+        self.saves = 0
+        # Loads and saves of each model.
+        self.loads_by_id: Counter[int] = collections.Counter()
+        self.saves_by_id: Counter[int] = collections.Counter()
+        self.col = self
+        self.db = FakeDB(self)
+
+    def add(self,
+            name: str,
+            templates: List[str],
+            css: str,
+            fields: Optional[List[str]] = None) -> int:
+        """Adds a model with one card type per template."""
+        mid = len(self.models) + 1
+        self.models[mid] = {
+            'id':
+            mid,
+            'name':
+            name,
+            'mod':
+            0,
+            'usn':
+            0,
+            'flds': [{
+                'name': fld
+            } for fld in fields or []],
+            'tmpls': [{
+                'name': f'Card {i + 1}',
+                'qfmt': tmpl,
+                'afmt': tmpl
+            } for i, tmpl in enumerate(templates)],
+            'css':
+            css,
+        }
+        return mid
+
+    def all_names_and_ids(self) -> List[NotetypeNameId]:
+        return [
+            NotetypeNameId(id=mid, name=model['name'])
+            for mid, model in self.models.items()
+        ]
+
+    def all(self) -> List[Model]:
+        self.loads += len(self.models)
+        return [copy.deepcopy(model) for model in self.models.values()]
+
+    def get(self, mid: int) -> Optional[Model]:
+        if mid not in self.models:
+            return None
+        self.loads += 1
+        self.loads_by_id[mid] += 1
+        # Like Anki, return the same dict until the model is saved.
+        model = self._cache[mid] = self.models[mid]
+        return model
+
+    def _get_cached(self, mid: int) -> Optional[Model]:
+        return self._cache.get(mid)
+
+    def _remove_from_cache(self, mid: int) -> None:
+        self._cache.pop(mid, None)
+
+    def save(self, model: Model) -> None:
+        self.saves += 1
+        self.saves_by_id[model['id']] += 1
+        self._remove_from_cache(model['id'])
+        self.models[model['id']] = copy.deepcopy(model)
+        self.models[model['id']]['mod'] += 1
+        self.models[model['id']]['usn'] = -1
 
 
 class FakeModelModifier(ModelModifier):
-    """A fake model modifier for testing purposes."""
+    """A fake model modifier for testing purposes.
+
+    The i-th template and the i-th style form a model with id i and name
+    `str(i)`.
+    """
 
     def __init__(self) -> None:
         self.templates: List[str] = []
         self.styles: List[str] = []
+        self.mtimes: Dict[int, int] = {}
+        self.passes = 0
 
-    def modify_templates(self, f: StringTransformer) -> None:
-        for i, tmpl in enumerate(self.templates):
-            self.templates[i] = f(tmpl)
+    def modify_templates(self, f: StringTransformer) -> ModificationReport:
+        return self.modify(f, identity)
 
-    def modify_styles(self, f: StringTransformer) -> None:
+    def modify(
+            self,
+            template_f: StringTransformer,
+            style_f: StringTransformer,
+            model_ids: Optional[Iterable[int]] = None) -> ModificationReport:
+        self.passes += 1
+        ids = (set(self.model_stamps())
+               if model_ids is None else set(model_ids))
+        modified = set()
+        for i, tmpl in enumerate(self.templates):
+            if i in ids:
+                self.templates[i] = template_f(tmpl)
+                if self.templates[i] != tmpl:
+                    modified.add(i)
         for i, style in enumerate(self.styles):
-            self.styles[i] = f(style)
+            if i in ids:
+                self.styles[i] = style_f(style)
+                if self.styles[i] != style:
+                    modified.add(i)
+        report = ModificationReport()
+        for i in sorted(ids):
+            if i in modified:
+                self.touch(i)
+                report.modified.append(str(i))
+            else:
+                report.unmodified.append(str(i))
+        return report
+
+    def plan(self,
+             template_f: StringTransformer,
+             style_f: StringTransformer,
+             model_ids: Optional[Iterable[int]] = None) -> List[ModelChange]:
+        stamps = self.model_stamps()
+        changes = []
+        for i in sorted(stamps if model_ids is None else model_ids):
+            change = ModelChange(id=i, name=str(i), stamp=stamps[i])
+            new_tmpl = new_css = ''
+            if i < len(self.templates):
+                new_tmpl = template_f(self.templates[i])
+                if new_tmpl != self.templates[i]:
+                    change.parts.append('qfmt')
+                    change.template_bytes += len(new_tmpl)
+                    change.byte_delta += len(new_tmpl) - len(self.templates[i])
+            if i < len(self.styles):
+                new_css = style_f(self.styles[i])
+                if new_css != self.styles[i]:
+                    change.parts.append('css')
+                    change.css_bytes += len(new_css)
+                    change.byte_delta += len(new_css) - len(self.styles[i])
+            if change.parts:
+                change.content = (new_css, [(new_tmpl, new_tmpl)])
+                changes.append(change)
+        return changes
+
+    def apply(self, changes: List[ModelChange]) -> ModificationReport:
+        self.passes += 1
+        report = ModificationReport()
+        for change in changes:
+            assert change.content is not None
+            new_css, [(new_tmpl, _)] = change.content
+            if change.id < len(self.templates):
+                self.templates[change.id] = new_tmpl
+            if change.id < len(self.styles):
+                self.styles[change.id] = new_css
+            self.touch(change.id)
+            report.modified.append(change.name)
+        return report
+
+    def model_stamps(self) -> Dict[int, ModelStamp]:
+        return {
+            i: (self.mtimes.get(i, 0), 0)
+            for i in range(max(len(self.templates), len(self.styles)))
+        }
+
+    def touch(self, i: int) -> None:
+        """Bumps the modification time of the i-th model."""
+        self.mtimes[i] = self.mtimes.get(i, 0) + 1
 
     def add_template(self, tmpl: str) -> None:
         """Adds a template to the fake modifier."""
@@ -0,0 +1,135 @@
+import unittest
+from textwrap import dedent
+
+from gregstyles.assets.css import (
+    Markup,
+    bundle,
+    embed_urls,
+    file_urls,
+    minify,
+    scan_markup,
+    split_statements,
+    strip_comments,
+    tree_shake,
+)
+
+
+class CssTestCase(unittest.TestCase):
+
+    def test_strip_comments_keeps_strings(self):
+        self.assertEqual(strip_comments('a/* x */{content:"/* y */"}'),
+                         'a {content:"/* y */"}')
+
+    def test_minify_collapses_whitespace(self):
+        self.assertEqual(
+            minify(
+                dedent('''\
+                /* The card. */
+                .card > * ,
+                .card  pre {
+                  margin: 0  auto;
+                  width: calc(100% - 2px);
+                }
+
+                @media (min-width: 10px) and (max-width: 20px) {
+                  a :hover { color: red; }
+                }
+                ''')),
+            '.card>*,.card pre{margin:0 auto;' + 'width:calc(100% - 2px)}' +
+            '@media (min-width:10px) and (max-width:20px){a :hover{color:red}}'
+        )
+
+    def test_minify_keeps_whitespace_in_strings(self):
+        self.assertEqual(minify('a::after { content: "  ;  }  " ; }'),
+                         'a::after{content:"  ;  }  "}')
+
+    def test_minify_keeps_last_copy_of_duplicate_rules(self):
+        self.assertEqual(minify('a { color: red; }\nb {}\na {color:red}'),
+                         'b{}a{color:red}')
+
+    def test_minify_keeps_statements_without_blocks_in_place(self):
+        self.assertEqual(
+            minify('@import url("a.css");\na {}\n@import url("a.css");'),
+            '@import url("a.css");a{}@import url("a.css");')
+
+    def test_split_statements(self):
+        self.assertEqual(
+            split_statements('@charset "a;b";a{}@media x{b{}c{}}'),
+            ['@charset "a;b";', 'a{}', '@media x{b{}c{}}'])
+
+    def test_bundle_concatenates_styles_in_order(self):
+        self.assertEqual(bundle(['a { color: red; }', 'b { color: blue; }']),
+                         'a{color:red}b{color:blue}')
+
+    def test_file_urls_lists_referenced_files(self):
+        css = dedent('''\
+            @font-face { src: url("font.woff2"), url(font.woff); }
+            .a { background: url( 'icon.svg' ) }
+            .b { background: url(data:image/png;base64,AAAA) }
+            .c { background: url(icon.svg) }
+            ''')
+        self.assertEqual(file_urls(css),
+                         ['font.woff2', 'font.woff', 'icon.svg'])
+
+    def test_embed_urls_replaces_only_given_files(self):
+        self.assertEqual(
+            embed_urls('.a { src: url(\'a.svg\'), url(b.svg) }',
+                       {'a.svg': 'data:image/svg+xml;base64,AA'}),
+            '.a { src: url("data:image/svg+xml;base64,AA"), url(b.svg) }')
+
+
+class TreeShakeTestCase(unittest.TestCase):
+
+    def test_scan_markup_collects_classes_and_ids(self):
+        markup = scan_markup(
+            ['<div class="a b" id=x>{{Front}}</div>', "<PRE class='c'>"])
+        self.assertEqual(markup.classes, {'a', 'b', 'c'})
+        self.assertEqual(markup.ids, {'x'})
+
+    def test_scan_markup_gives_up_on_generated_attributes(self):
+        markup = scan_markup(['<div class="{{Tags}}" id="a">'])
+        self.assertIsNone(markup.classes)
+        self.assertEqual(markup.ids, {'a'})
+        self.assertEqual(scan_markup(['<script>x()</script>']),
+                         Markup(classes=None, ids=None))
+
+    def test_tree_shake_drops_rules_that_cannot_match(self):
+        markup = scan_markup(['<div class="a"><pre>{{Front}}</pre></div>'])
+        self.assertEqual(
+            tree_shake(
+                dedent('''\
+                .a pre { x: 1; }
+                .b, .a:not(.b) { x: 2; }
+                #notes h4 { x: 3; }
+                kbd.a { x: 4; }
+                @media (min-width: 10px) { .b { x: 5; } }
+                @media print { .a { x: 6; } }
+                .nightMode .cloze, .card3 { x: 7; }
+                [lang="ja"] { x: 8; }
+                @font-face { font-family: f; }
+                '''), markup).splitlines(), [
+                    '.a pre { x: 1; }',
+                    '.a:not(.b) { x: 2; }',
+                    'kbd.a { x: 4; }',
+                    '@media print {.a { x: 6; }}',
+                    '.nightMode .cloze,.card3 { x: 7; }',
+                    '[lang="ja"] { x: 8; }',
+                    '@font-face { font-family: f; }',
+                ])
+
+    def test_tree_shake_keeps_rules_of_elements_that_filters_generate(self):
+        markup = scan_markup(['<div>{{hint:Notes}}</div>'])
+        self.assertEqual(
+            tree_shake('.nightMode a { x: 1; }\na.hint { x: 2; }', markup),
+            '.nightMode a { x: 1; }\na.hint { x: 2; }')
+
+    def test_markup_union_contains_both(self):
+        a = scan_markup(['<p class="a" id="x">'])
+        self.assertEqual(a.union(scan_markup(['<p class="b">'])),
+                         Markup(classes={'a', 'b'}, ids={'x'}))
+        self.assertEqual(a.union(scan_markup(['<script>'])),
+                         Markup(classes=None, ids=None))
+
+    def test_tree_shake_keeps_everything_for_unknown_markup(self):
+        css = '.a { x: 1; }\n#b { x: 2; }\npre { x: 3; }'
+        self.assertEqual(tree_shake(css, Markup(classes=None, ids=None)), css)
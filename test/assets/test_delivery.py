@@ -0,0 +1,105 @@
+import unittest
+
+from gregstyles.assets.delivery import (
+    DATA_URI,
+    INLINE,
+    INLINE_CSS_LIMIT,
+    INLINE_TOTAL_LIMIT,
+    INLINE_TOTAL_MARGIN,
+    MEDIA,
+    data_uri,
+    plan_delivery,
+)
+
+
+class PlanDeliveryTestCase(unittest.TestCase):
+
+    def deliveries(self,
+                   sizes,
+                   references=None,
+                   model_count=10,
+                   mode='auto',
+                   previous=None):
+        plan = plan_delivery(['main.css'], sizes, references or {},
+                             model_count, mode, previous)
+        return {
+            asset: decision.delivery
+            for asset, decision in plan.decisions.items()
+        }
+
+    def test_small_styles_are_inlined(self):
+        self.assertEqual(self.deliveries({'main.css': 3000}),
+                         {'main.css': INLINE})
+
+    def test_large_styles_are_served_from_media(self):
+        self.assertEqual(self.deliveries({'main.css': INLINE_CSS_LIMIT + 1}),
+                         {'main.css': MEDIA})
+
+    def test_styles_shared_by_many_note_types_are_served_from_media(self):
+        size = 3000
+        self.assertEqual(
+            self.deliveries({'main.css': size},
+                            model_count=INLINE_TOTAL_LIMIT // size + 1),
+            {'main.css': MEDIA})
+
+    def test_styles_near_the_cutoff_keep_their_previous_delivery(self):
+        size = 3000
+        cutoff = INLINE_TOTAL_LIMIT // size
+        margin = int(cutoff * INLINE_TOTAL_MARGIN)
+        for model_count, previous, delivery in [
+            (cutoff + 1, INLINE, INLINE),
+            (cutoff + margin, INLINE, INLINE),
+            (cutoff + margin + 1, INLINE, MEDIA),
+            (cutoff, MEDIA, MEDIA),
+            (cutoff - margin + 1, MEDIA, MEDIA),
+            (cutoff - margin, MEDIA, INLINE),
+        ]:
+            with self.subTest(model_count=model_count, previous=previous):
+                self.assertEqual(
+                    self.deliveries({'main.css': size},
+                                    model_count=model_count,
+                                    previous={'main.css': previous}),
+                    {'main.css': delivery})
+
+    def test_config_forces_delivery_of_styles(self):
+        self.assertEqual(
+            self.deliveries({'main.css': INLINE_CSS_LIMIT + 1}, mode='inline'),
+            {'main.css': INLINE})
+        self.assertEqual(self.deliveries({'main.css': 10}, mode='import'),
+                         {'main.css': MEDIA})
+
+    def test_tiny_assets_of_inline_styles_are_embedded(self):
+        self.assertEqual(
+            self.deliveries(
+                {
+                    'main.css': 3000,
+                    'icon.svg': 500,
+                    'font.woff2': 50_000,
+                    'script.js': 100,
+                },
+                references={'main.css': ['icon.svg', 'font.woff2']}), {
+                    'main.css': INLINE,
+                    'icon.svg': DATA_URI,
+                    'font.woff2': MEDIA,
+                    'script.js': MEDIA,
+                })
+
+    def test_assets_of_served_styles_are_served(self):
+        self.assertEqual(
+            self.deliveries({
+                'main.css': 3000,
+                'icon.svg': 500
+            },
+                            references={'main.css': ['icon.svg']},
+                            mode='import'), {
+                                'main.css': MEDIA,
+                                'icon.svg': MEDIA
+                            })
+
+    def test_unknown_mode_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.deliveries({'main.css': 10}, mode='carrier pigeon')
+
+    def test_data_uri_encodes_data_with_mime_type(self):
+        self.assertEqual(data_uri('font.woff2', b'abc'),
+                         'data:font/woff2;base64,YWJj')
@@ -0,0 +1,49 @@
+import pathlib
+import tempfile
+import unittest
+
+from gregstyles.assets.fingerprint import ModelCache, content_hash
+
+
+class ModelCacheTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.tmp_dir.name) / 'dir' / 'cache.json'
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_all_models_are_stale_in_empty_cache(self):
+        cache = ModelCache(self.path)
+        self.assertEqual(cache.stale_models({
+            1: (0, 0),
+            2: (0, 0)
+        }, 'h'), [1, 2])
+
+    def test_saved_cache_reads_back(self):
+        cache = ModelCache(self.path)
+        cache.update({1: (10, -1), 2: (20, 3)}, 'h', [1, 2])
+        cache.save()
+
+        cache = ModelCache(self.path)
+
+        self.assertEqual(cache.stale_models({
+            1: (10, -1),
+            2: (21, 3)
+        }, 'h'), [2])
+        self.assertEqual(cache.stale_models({1: (10, -1)}, 'other'), [1])
+
+    def test_update_forgets_deleted_models(self):
+        cache = ModelCache(self.path)
+        cache.update({1: (10, 0), 2: (20, 0)}, 'h', [1, 2])
+        cache.update({2: (20, 0)}, 'h', [])
+        self.assertEqual(list(cache.entries), [2])
+
+    def test_malformed_cache_is_empty(self):
+        self.path.parent.mkdir()
+        self.path.write_text('{"1": 2}')
+        self.assertEqual(ModelCache(self.path).entries, {})
+
+    def test_content_hash_separates_parts(self):
+        self.assertNotEqual(content_hash('ab', 'c'), content_hash('a', 'bc'))
@@ -2,11 +2,16 @@ import unittest
 from textwrap import dedent
 
 from gregstyles.assets.guard import (
+    GuardRegistry,
     append_guarded_snippet,
     delete_guarded_snippet,
     guard_comments,
+    guard_css_comments,
+    prepend_guarded_snippet,
 )
 
+GUARDS = ('<!-- Foo BEGIN -->\n', '<!-- Foo END -->\n')
+
 
 class AssetsGuardTestCase(unittest.TestCase):
 
@@ -57,3 +62,112 @@ class AssetsGuardTestCase(unittest.TestCase):
             delete_guarded_snippet(
                 TMPL, ('<!-- Foo BEGIN -->\n', '<!-- Foo END -->\n')),
             '{{Cloze}}\n')
+
+    def test_delete_deletes_each_of_multiple_snippets(self):
+        TMPL = dedent('''\
+            {{Front}}
+
+            <!-- Foo BEGIN -->
+            A
+            <!-- Foo END -->
+            {{Back}}
+            <!-- Foo BEGIN -->
+            B
+            <!-- Foo END -->
+            ''')
+        self.assertEqual(delete_guarded_snippet(TMPL, GUARDS),
+                         '{{Front}}\n{{Back}}\n')
+
+    def test_delete_collapses_adjacent_snippets(self):
+        TMPL = dedent('''\
+            {{Front}}
+
+            <!-- Foo BEGIN -->
+            A
+            <!-- Foo END -->
+
+            <!-- Foo BEGIN -->
+            B
+            <!-- Foo END -->
+            ''')
+        self.assertEqual(delete_guarded_snippet(TMPL, GUARDS), '{{Front}}\n')
+
+    def test_delete_leaves_unterminated_snippet(self):
+        TMPL = '{{Front}}\n<!-- Foo BEGIN -->\nA\n'
+        self.assertEqual(delete_guarded_snippet(TMPL, GUARDS), TMPL)
+
+    def test_prepend_after_delete_is_idempotent(self):
+        GUARDS = ('/* Foo BEGIN */\n', '/* Foo END */\n')
+        css = prepend_guarded_snippet('.card {}\n', '@import "a.css";\n',
+                                      GUARDS)
+        self.assertEqual(
+            css,
+            dedent('''\
+            /* Foo BEGIN */
+            @import "a.css";
+            /* Foo END */
+
+            .card {}
+            '''))
+        self.assertEqual(
+            prepend_guarded_snippet(delete_guarded_snippet(css, GUARDS),
+                                    '@import "a.css";\n', GUARDS), css)
+
+
+class GuardRegistryTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.foo = guard_css_comments('Foo')
+        self.bar = guard_css_comments('Bar')
+        self.registry = GuardRegistry([self.foo, self.bar])
+
+    def test_register_rejects_duplicate_guard(self):
+        with self.assertRaises(ValueError):
+            self.registry.register(self.foo)
+
+    def test_delete_deletes_snippets_of_all_guards(self):
+        css = append_guarded_snippet(
+            append_guarded_snippet('.card {}\n', '.foo {}\n', self.foo),
+            '.bar {}\n', self.bar) + '.tail {}\n'
+
+        self.assertEqual(self.registry.delete(css), '.card {}\n\n.tail {}\n')
+
+    def test_delete_leaves_unterminated_snippet_of_one_guard(self):
+        css = (self.foo[0] + '.card {}\n' +
+               append_guarded_snippet('', '.bar {}\n', self.bar))
+
+        self.assertEqual(self.registry.delete(css), self.foo[0] + '.card {}\n')
+
+    def test_delete_matches_single_guard_deletion(self):
+        css = dedent('''\
+            .card {}
+
+            /* Foo BEGIN */
+            .foo {}
+            /* Foo END */
+            .tail {}
+            ''')
+        self.assertEqual(
+            GuardRegistry([self.foo]).delete(css),
+            delete_guarded_snippet(css, self.foo))
+
+    def test_replace_matches_replacing_each_guard_in_turn(self):
+        snippets = {self.foo: '.foo {}\n', self.bar: '.bar {}\n'}
+        css = self.registry.replace('.card {}\n', snippets)
+
+        expected = css
+        for guards, snippet in snippets.items():
+            expected = append_guarded_snippet(
+                delete_guarded_snippet(expected, guards), snippet, guards)
+        self.assertEqual(css, expected)
+        self.assertEqual(self.registry.replace(css, snippets), css)
+
+    def test_replace_deletes_snippets_of_guards_without_new_ones(self):
+        css = self.registry.replace('.card {}\n', {
+            self.foo: '.foo {}\n',
+            self.bar: '.bar {}\n'
+        })
+
+        self.assertEqual(
+            self.registry.replace(css, {self.bar: '.bar {}\n'}),
+            append_guarded_snippet('.card {}\n', '.bar {}\n', self.bar))
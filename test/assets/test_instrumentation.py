@@ -0,0 +1,35 @@
+import unittest
+
+from gregstyles.assets.instrumentation import SyncReport, timed
+from gregstyles.assets.model import ModificationReport
+
+
+class SyncReportTestCase(unittest.TestCase):
+
+    def test_span_accumulates_phase_time(self):
+        report = SyncReport()
+        with report.span('models'):
+            pass
+        with report.span('models'):
+            pass
+        self.assertEqual(list(report.phases), ['models'])
+        self.assertGreaterEqual(report.phases['models'], 0.0)
+
+    def test_add_modification_counts_models_and_bytes(self):
+        report = SyncReport()
+        report.add_modification(
+            ModificationReport(modified=['A'],
+                               unmodified=['B', 'C'],
+                               template_bytes=10,
+                               css_bytes=5))
+        self.assertEqual(report.models_visited, 3)
+        self.assertEqual(report.models_saved, 1)
+        self.assertEqual(report.template_bytes_rewritten, 10)
+        self.assertEqual(report.css_bytes_rewritten, 5)
+
+    def test_timed_does_nothing_without_report(self):
+        with timed(None, 'models'):
+            pass
+
+    def test_format_lists_counters(self):
+        self.assertIn('Media files added: 0', SyncReport().format())
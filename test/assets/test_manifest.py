@@ -0,0 +1,83 @@
+import pathlib
+import tempfile
+import unittest
+
+from gregstyles.assets.manifest import (
+    AssetDiff,
+    AssetEntry,
+    HashCache,
+    build_manifest,
+    diff_manifests,
+    hash_file,
+    read_manifest,
+    write_manifest,
+)
+
+
+class ManifestTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dir = pathlib.Path(self.tmp_dir.name)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_build_manifest_hashes_prefixed_assets_except_manifest(self):
+        (self.dir / '_p-a.css').write_text('a')
+        (self.dir / '_p-manifest.json').write_text('{}')
+        (self.dir / 'other.css').write_text('o')
+
+        manifest = build_manifest(self.dir, '_p-', '_p-manifest.json')
+
+        self.assertEqual(
+            manifest, {
+                '_p-a.css':
+                AssetEntry(sha256=hash_file(self.dir / '_p-a.css'), size=1)
+            })
+
+    def test_written_manifest_reads_back(self):
+        manifest = {'_p-a.css': AssetEntry(sha256='abc', size=3)}
+        write_manifest(manifest, self.dir / 'manifest.json')
+        self.assertEqual(read_manifest(self.dir / 'manifest.json'), manifest)
+
+    def test_read_manifest_returns_none_on_malformed_file(self):
+        (self.dir / 'manifest.json').write_text('[1, 2]')
+        self.assertIsNone(read_manifest(self.dir / 'manifest.json'))
+        self.assertIsNone(read_manifest(self.dir / 'nonexistent.json'))
+
+    def test_read_manifest_returns_none_on_entries_without_size(self):
+        (self.dir / 'manifest.json').write_text('{"_p-a.css": "abc"}')
+        self.assertIsNone(read_manifest(self.dir / 'manifest.json'))
+
+    def test_diff_manifests(self):
+        self.assertEqual(
+            diff_manifests(
+                {
+                    'same': AssetEntry('1', 1),
+                    'changed': AssetEntry('1', 1),
+                    'removed': AssetEntry('1', 1)
+                }, {
+                    'same': AssetEntry('1', 1),
+                    'changed': AssetEntry('2', 1),
+                    'added': AssetEntry('1', 1)
+                }),
+            AssetDiff(added=['added'],
+                      changed=['changed'],
+                      removed=['removed']))
+
+    def test_hash_cache_rehashes_changed_files(self):
+        path = self.dir / '_p-a.css'
+        path.write_text('a')
+        cache = HashCache(self.dir / 'cache.json')
+        self.assertEqual(cache.entry(path), AssetEntry(hash_file(path), 1))
+        cache.save()
+
+        path.write_text('b')
+
+        self.assertEqual(
+            HashCache(self.dir / 'cache.json').entry(path),
+            AssetEntry(hash_file(path), 1))
+
+    def test_hash_cache_returns_none_for_missing_files(self):
+        self.assertIsNone(HashCache().entry(self.dir / 'nonexistent.css'))
@@ -0,0 +1,255 @@
+import unittest
+from typing import Any, Dict, List, Tuple, cast
+from unittest import mock
+
+from anki.collection import ModelManager
+
+from gregstyles.assets.model import (
+    AnkiModelModifier,
+    ModelChange,
+    ModelInfo,
+    ModelSelector,
+)
+from test.assets.model import FakeModelManager
+
+
+class AnkiModelModifierTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.model_manager = FakeModelManager()
+        self.modifier = AnkiModelModifier(
+            cast(ModelManager, self.model_manager))
+
+    def test_modify_loads_and_saves_each_model_once(self):
+        mid = self.model_manager.add('Basic', ['{{Front}}', '{{Back}}'],
+                                     '.card {}')
+        self.model_manager.add('Cloze', ['{{cloze:Text}}'], '.cloze {}')
+
+        self.modifier.modify(lambda tmpl: tmpl + '!', lambda css: css + '?')
+
+        self.assertEqual(self.model_manager.loads, 2)
+        self.assertEqual(self.model_manager.saves, 2)
+        model = self.model_manager.models[mid]
+        self.assertEqual([(t['qfmt'], t['afmt']) for t in model['tmpls']],
+                         [('{{Front}}!', '{{Front}}!'),
+                          ('{{Back}}!', '{{Back}}!')])
+        self.assertEqual(model['css'], '.card {}?')
+
+    def test_modify_saves_only_changed_models(self):
+        self.model_manager.add('Basic', ['{{Front}}'], '.card {}')
+        self.model_manager.add('Cloze', ['{{cloze:Text}}'], '.cloze {}')
+
+        report = self.modifier.modify(
+            lambda tmpl: tmpl.replace('cloze:', 'cloze-only:'),
+            lambda css: css)
+
+        self.assertEqual(self.model_manager.saves, 1)
+        self.assertEqual(report.modified, ['Cloze'])
+        self.assertEqual(report.unmodified, ['Basic'])
+        self.assertEqual(report.template_bytes, 2 * len('{{cloze-only:Text}}'))
+        self.assertEqual(report.css_bytes, 0)
+
+    def test_modify_loads_only_given_models(self):
+        self.model_manager.add('Basic', ['{{Front}}'], '.card {}')
+        mid = self.model_manager.add('Cloze', ['{{cloze:Text}}'], '.cloze {}')
+
+        report = self.modifier.modify(lambda tmpl: tmpl,
+                                      lambda css: css + '?',
+                                      model_ids=[mid])
+
+        self.assertEqual(self.model_manager.loads, 1)
+        self.assertEqual(report.modified, ['Cloze'])
+
+    def test_modify_does_not_grow_model_cache(self):
+        cached = self.model_manager.add('Basic', ['{{Front}}'], '.card {}')
+        self.model_manager.add('Cloze', ['{{cloze:Text}}'], '.cloze {}')
+        self.model_manager.add('Other', ['{{Other}}'], '.other {}')
+        self.model_manager.get(cached)
+
+        self.modifier.modify(lambda tmpl: tmpl,
+                             lambda css: css.replace('.cloze', '.c'))
+
+        self.assertEqual(list(self.model_manager._cache), [cached])
+
+    def test_modify_after_plan_saves_planned_changes(self):
+        mid = self.model_manager.add('Basic', ['{{Front}}'], '.card {}')
+        self.model_manager.get(mid)
+
+        def style_f(css):
+            return css + '?'
+
+        changes = self.modifier.plan(lambda tmpl: tmpl, style_f)
+        report = self.modifier.modify(lambda tmpl: tmpl, style_f)
+
+        self.assertEqual([change.id for change in changes], [mid])
+        self.assertEqual(report.modified, ['Basic'])
+        self.assertEqual(self.model_manager.models[mid]['css'], '.card {}?')
+
+    def test_apply_saves_planned_content_loading_each_model_once(self):
+        mid = self.model_manager.add('Basic', ['{{Front}}'], '.card {}')
+        self.model_manager.add('Cloze', ['{{cloze:Text}}'], '.cloze {}')
+        changes = self.modifier.plan(lambda tmpl: tmpl,
+                                     lambda css: css.replace('.card', '.c'))
+        self.model_manager.loads = 0
+
+        report = self.modifier.apply(changes)
+
+        self.assertEqual(self.model_manager.loads, 1)
+        self.assertEqual(self.model_manager.saves, 1)
+        self.assertEqual(report.modified, ['Basic'])
+        self.assertEqual(self.model_manager.models[mid]['css'], '.c {}')
+
+    def test_plan_reports_changes_without_saving(self):
+        mid = self.model_manager.add('Basic', ['{{Front}}', '{{Back}}'],
+                                     '.card {}')
+        self.model_manager.add('Cloze', ['{{cloze:Text}}'], '.cloze {}')
+
+        changes = self.modifier.plan(
+            lambda tmpl: tmpl.replace('Front', 'Frönt'), lambda css: css)
+
+        self.assertEqual(self.model_manager.saves, 0)
+        self.assertEqual(changes, [
+            ModelChange(id=mid,
+                        name='Basic',
+                        stamp=(0, 0),
+                        parts=['qfmt', 'afmt'],
+                        template_bytes=2 * len('{{Frönt}}'.encode()),
+                        byte_delta=2,
+                        content=('.card {}', [('{{Frönt}}', '{{Frönt}}'),
+                                              ('{{Back}}', '{{Back}}')]))
+        ])
+
+    def test_model_stamps_change_on_save(self):
+        mid = self.model_manager.add('Basic', ['{{Front}}'], '.card {}')
+        stamps = self.modifier.model_stamps()
+
+        self.modifier.modify(lambda tmpl: tmpl, lambda css: css + '?')
+
+        self.assertNotEqual(self.modifier.model_stamps()[mid], stamps[mid])
+
+    def test_modify_streams_models_and_reports_progress(self) -> None:
+        for name in ['A', 'B', 'C']:
+            self.model_manager.add(name, ['{{Front}}'], '.card {}')
+        progress: List[Tuple[int, int, int]] = []
+        self.modifier = AnkiModelModifier(
+            cast(ModelManager, self.model_manager),
+            progress=lambda done, total: progress.append(
+                (done, total, self.model_manager.loads)))
+
+        self.modifier.modify(lambda tmpl: tmpl, lambda css: css + '?')
+
+        self.assertEqual(progress, [(1, 3, 1), (2, 3, 2), (3, 3, 3)])
+
+    def contents(self) -> Dict[int, Tuple[str, List[str]]]:
+        return {
+            mid: (model['css'], [tmpl['qfmt'] for tmpl in model['tmpls']])
+            for mid, model in self.model_manager.models.items()
+        }
+
+    def test_modify_restores_saved_models_if_a_save_fails(self) -> None:
+        for name in ['A', 'B', 'C', 'D']:
+            self.model_manager.add(name, ['{{Front}}'], '.card {}')
+        old_contents = self.contents()
+        save = self.model_manager.save
+
+        def failing_save(model: Dict[str, Any]) -> None:
+            if model['name'] == 'C':
+                raise RuntimeError('The disk is full.')
+            save(model)
+
+        patch_save = mock.patch.object(self.model_manager,
+                                       'save',
+                                       side_effect=failing_save)
+        with patch_save, self.assertRaises(RuntimeError):
+            self.modifier.modify(lambda tmpl: tmpl + '!',
+                                 lambda css: css + '?')
+
+        self.assertEqual(self.contents(), old_contents)
+
+    def test_modify_restores_saved_models_if_a_transformer_fails(self):
+        for name in ['A', 'B', 'C']:
+            self.model_manager.add(name, ['{{Front}}'], '.card {}')
+        old_contents = self.contents()
+        calls = 0
+
+        def failing_style(css: str) -> str:
+            nonlocal calls
+            calls += 1
+            if calls == 3:
+                raise KeyboardInterrupt()
+            return css + '?'
+
+        with self.assertRaises(KeyboardInterrupt):
+            self.modifier.modify(lambda tmpl: tmpl + '!', failing_style)
+
+        self.assertEqual(self.contents(), old_contents)
+
+        self.modifier.modify(lambda tmpl: tmpl + '!', lambda css: css + '?')
+        self.assertEqual(
+            self.contents(), {
+                mid: (css + '?', [qfmt + '!' for qfmt in qfmts])
+                for mid, (css, qfmts) in old_contents.items()
+            })
+
+    def select(self, selector: ModelSelector) -> None:
+        self.modifier = AnkiModelModifier(
+            cast(ModelManager, self.model_manager), selector)
+
+    def test_modify_loads_only_models_selected_by_name_glob(self):
+        self.model_manager.add('Greg Basic', ['{{Front}}'], '.card {}')
+        self.model_manager.add('Shared deck', ['{{Front}}'], '.card {}')
+        self.select(ModelSelector(name_globs=['Greg *']))
+
+        report = self.modifier.modify(lambda tmpl: tmpl, lambda css: css + '?')
+
+        self.assertEqual(self.model_manager.loads, 1)
+        self.assertEqual(self.model_manager.saves, 1)
+        self.assertEqual(report.modified, ['Greg Basic'])
+        self.assertEqual(report.unmodified, [])
+
+    def test_modify_intersects_given_models_with_selection(self):
+        mid = self.model_manager.add('Basic', ['{{Front}}'], '.card {}')
+        other = self.model_manager.add('Cloze', ['{{cloze:Text}}'], '.c {}')
+        self.select(ModelSelector(ids=[mid]))
+
+        report = self.modifier.modify(lambda tmpl: tmpl,
+                                      lambda css: css + '?',
+                                      model_ids=[mid, other])
+
+        self.assertEqual(report.modified, ['Basic'])
+
+    def test_predicate_sees_field_and_template_names(self) -> None:
+        self.model_manager.add('Basic', ['{{Front}}', '{{Back}}'],
+                               '.card {}',
+                               fields=['Front', 'Back'])
+        mid = self.model_manager.add('Code', ['{{Code}}'],
+                                     '.card {}',
+                                     fields=['Code'])
+        infos: List[ModelInfo] = []
+
+        def has_code_field(info: ModelInfo) -> bool:
+            infos.append(info)
+            return 'Code' in info.field_names
+
+        self.select(ModelSelector(predicate=has_code_field))
+
+        self.assertEqual(list(self.modifier.model_stamps()), [mid])
+        self.assertEqual(self.model_manager.loads, 0)
+        self.assertEqual(infos, [
+            ModelInfo(id=1,
+                      name='Basic',
+                      field_names=('Front', 'Back'),
+                      template_names=('Card 1', 'Card 2')),
+            ModelInfo(id=mid,
+                      name='Code',
+                      field_names=('Code', ),
+                      template_names=('Card 1', ))
+        ])
+
+    def test_empty_selector_selects_all_models_without_queries(self):
+        self.model_manager.add('Basic', ['{{Front}}'], '.card {}')
+        self.model_manager.add('Cloze', ['{{cloze:Text}}'], '.cloze {}')
+
+        self.assertEqual(len(self.modifier.model_stamps()), 2)
+        self.assertIsNone(self.modifier.selected_model_ids())
+        self.assertEqual(self.model_manager.db.queries, 1)
@@ -0,0 +1,36 @@
+import unittest
+
+from gregstyles.assets.model import ModelChange
+from gregstyles.assets.plan import SyncPlan
+
+
+class SyncPlanTestCase(unittest.TestCase):
+
+    def test_empty_plan(self):
+        plan = SyncPlan()
+        self.assertTrue(plan.is_empty())
+        self.assertEqual(plan.model_saves, 0)
+        self.assertEqual(plan.media_bytes, 0)
+
+    def test_format_lists_changes_and_cost(self):
+        plan = SyncPlan(media_added={'_p-a.css': 10},
+                        media_trashed=['_p-b.css'],
+                        model_changes=[
+                            ModelChange(id=1,
+                                        name='Basic',
+                                        stamp=(0, 0),
+                                        parts=['qfmt', 'css'],
+                                        template_bytes=5,
+                                        css_bytes=7,
+                                        byte_delta=-3)
+                        ])
+
+        self.assertEqual(plan.format().splitlines(), [
+            'Note type Basic: qfmt, css (-3 B)',
+            'Add media file _p-a.css (10 B)',
+            'Trash media file _p-b.css',
+            'Note types saved: 1',
+            'Template and CSS bytes rewritten: 12',
+            'Media files added: 1 (10 B to upload)',
+            'Media files trashed: 1',
+        ])
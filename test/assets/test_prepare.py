@@ -0,0 +1,47 @@
+import pathlib
+import tempfile
+import threading
+import unittest
+from typing import List
+
+from gregstyles.assets.manifest import asset_entry, map_bounded
+from gregstyles.assets.prepare import prepare_assets
+
+
+class MapBoundedTestCase(unittest.TestCase):
+
+    def test_map_bounded_yields_results_in_order(self):
+        self.assertEqual(list(map_bounded(lambda x: x * x, range(20), 4)),
+                         [x * x for x in range(20)])
+
+    def test_map_bounded_limits_results_held_ahead_of_consumer(self):
+        started: List[int] = []
+        lock = threading.Lock()
+
+        def record(x: int) -> int:
+            with lock:
+                started.append(x)
+            return x
+
+        results = map_bounded(record, range(100), max_workers=2)
+        next(results)
+        self.assertLessEqual(len(started), 5)
+        self.assertEqual(list(results), list(range(1, 100)))
+
+
+class PrepareAssetsTestCase(unittest.TestCase):
+
+    def test_prepare_assets_reads_and_hashes_assets(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            directory = pathlib.Path(tmp_dir)
+            (directory / 'a.css').write_text('.a {}')
+            (directory / 'b.woff').write_bytes(b'\0' * 100_000)
+
+            prepared = list(prepare_assets(directory, ['b.woff', 'a.css']))
+
+            self.assertEqual([asset.name for asset in prepared],
+                             ['b.woff', 'a.css'])
+            self.assertEqual(prepared[1].data, b'.a {}')
+            for asset in prepared:
+                self.assertEqual(asset.entry,
+                                 asset_entry(directory / asset.name))
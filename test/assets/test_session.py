@@ -0,0 +1,46 @@
+import os
+import pathlib
+import tempfile
+import unittest
+from typing import List
+
+from gregstyles.assets.session import StatCache
+
+
+class StatCacheTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dir = pathlib.Path(self.tmp_dir.name)
+        (self.dir / 'a.css').write_text('a')
+        self.loads: List[str] = []
+        self.cache: StatCache[str] = StatCache()
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def load(self) -> str:
+        content = (self.dir / 'a.css').read_text()
+        self.loads.append(content)
+        return content
+
+    def test_get_loads_once_while_files_are_unchanged(self):
+        self.assertEqual(self.cache.get(self.dir, self.load), 'a')
+        self.assertEqual(self.cache.get(self.dir, self.load), 'a')
+        self.assertEqual(self.loads, ['a'])
+
+    def test_get_reloads_changed_files(self):
+        self.cache.get(self.dir, self.load)
+        (self.dir / 'a.css').write_text('b')
+        os.utime(self.dir / 'a.css', ns=(1, 1))
+
+        self.assertEqual(self.cache.get(self.dir, self.load), 'b')
+        self.assertEqual(self.loads, ['a', 'b'])
+
+    def test_get_reloads_when_directory_changes(self):
+        self.cache.get(self.dir, self.load)
+        other_dir = self.dir / 'other'
+        other_dir.mkdir()
+
+        self.cache.get(other_dir, self.load)
+        self.assertEqual(len(self.loads), 2)
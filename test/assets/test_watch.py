@@ -0,0 +1,64 @@
+import pathlib
+import tempfile
+import threading
+import unittest
+from typing import List
+
+from gregstyles.assets.watch import AssetWatcher
+
+
+class AssetWatcherTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dir = pathlib.Path(self.tmp_dir.name)
+        (self.dir / 'a.css').write_text('a')
+        self.changes: List[List[str]] = []
+        self.watcher = AssetWatcher(self.dir,
+                                    self.changes.append,
+                                    debounce=0.2)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_poll_reports_changes_after_debounce(self):
+        (self.dir / 'a.css').write_text('aa')
+        (self.dir / 'b.css').write_text('b')
+
+        self.watcher.poll(0.0)
+        self.watcher.poll(0.1)
+        self.assertEqual(self.changes, [])
+
+        self.watcher.poll(0.2)
+        self.assertEqual(self.changes, [['a.css', 'b.css']])
+
+    def test_poll_reports_burst_of_changes_once(self):
+        (self.dir / 'a.css').write_text('aa')
+        self.watcher.poll(0.0)
+        (self.dir / 'a.css').unlink()
+        self.watcher.poll(0.15)
+        self.watcher.poll(0.3)
+        self.assertEqual(self.changes, [])
+
+        self.watcher.poll(0.35)
+        self.watcher.poll(0.4)
+
+        self.assertEqual(self.changes, [['a.css']])
+
+    def test_poll_reports_nothing_without_changes(self):
+        self.watcher.poll(0.0)
+        self.watcher.poll(1.0)
+        self.assertEqual(self.changes, [])
+
+    def test_watcher_thread_reports_changes(self):
+        changed = threading.Event()
+        watcher = AssetWatcher(self.dir,
+                               lambda _: changed.set(),
+                               interval=0.01,
+                               debounce=0.02)
+        watcher.start()
+        try:
+            (self.dir / 'a.css').write_text('aa')
+            self.assertTrue(changed.wait(timeout=5))
+        finally:
+            watcher.stop()
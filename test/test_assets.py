@@ -1,45 +1,456 @@
+import contextlib
+import os
+import pathlib
 import tempfile
 import unittest
 from textwrap import dedent
+from typing import Iterator, List, Optional, cast
+from unittest import mock
+
+from anki.collection import ModelManager
+from anki.media import MediaManager
 
 from gregstyles import assets
 from gregstyles.assets import append_import_statements, delete_import_statements
-from test.assets.model import FakeModelModifier
+from gregstyles.assets.css import Markup, scan_markup
+from gregstyles.assets.fingerprint import ModelCache
+from gregstyles.assets.instrumentation import SyncReport
+from gregstyles.assets.manifest import (
+    AssetDiff,
+    AssetEntry,
+    HashCache,
+    Manifest,
+    diff_manifests,
+    hash_file,
+    read_manifest,
+    write_manifest,
+)
+from gregstyles.assets.model import AnkiModelModifier
+from test.assets.media import FakeMediaManager
+from test.assets.model import FakeModelManager, FakeModelModifier
+
+GUARD = 'Anki Greg Styles'
+PREFIX = '_greg-styles-'
+MANIFEST = f'{PREFIX}manifest.json'
+ENTRY_1 = AssetEntry(sha256='1', size=1)
+ENTRY_2 = AssetEntry(sha256='2', size=1)
 
 
 class FakeAssetManager:
 
-    def __init__(self, local_version: int, plugin_version: int):
-        self.local_version = local_version
-        self.plugin_version = plugin_version
+    def __init__(self, local: Manifest, plugin: Manifest):
+        self.local = local
+        self.plugin = plugin
+        self.plans = 0
+        self.updates = 0
+
+    def plan_sync(self) -> assets.SyncPlan:
+        self.plans += 1
+        diff = diff_manifests(self.local, self.plugin)
+        return assets.SyncPlan(diff=diff,
+                               media_added={
+                                   asset: self.plugin[asset].size
+                                   for asset in diff.added + diff.changed
+                               },
+                               media_trashed=diff.changed + diff.removed)
+
+    def apply_plan(self, plan: assets.SyncPlan) -> None:
+        if not plan.is_empty():
+            self.updates += 1
+            self.local = dict(self.plugin)
+
+
+class AnkiAssetManagerTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        root = pathlib.Path(self.tmp_dir.name)
+        self.plugin_dir = root / 'asset-files'
+        self.media_dir = root / 'collection.media'
+        self.plugin_dir.mkdir()
+        self.media_dir.mkdir()
+        self.media = FakeMediaManager(self.media_dir)
+        self.models = FakeModelModifier()
+        self.models.add_template('{{Front}}')
+        self.models.add_style('.card {}')
+        self.manager = assets.AnkiAssetManager(
+            self.models,
+            cast(MediaManager, self.media),
+            external_css=[],
+            internal_css='.main {}\n',
+            style_assets=[f'{PREFIX}main.css'],
+            guard=GUARD,
+            plugin_assets=self.plugin_dir,
+            asset_prefix=PREFIX,
+            manifest_name=MANIFEST)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_sync_installs_assets_into_empty_media(self):
+        (self.plugin_dir / f'{PREFIX}main.css').write_text('.main {}\n')
+
+        assets.sync_assets(self.manager)
+
+        self.assertEqual((self.media_dir / f'{PREFIX}main.css').read_text(),
+                         '.main {}\n')
+        self.assertEqual(read_manifest(self.media_dir / MANIFEST),
+                         self.manager.plugin_manifest())
+        self.assertIn('.main {}', self.models.styles[0])
+
+    def test_sync_touches_only_changed_assets(self):
+        (self.plugin_dir / f'{PREFIX}main.css').write_text('.main {}\n')
+        (self.plugin_dir / f'{PREFIX}font.woff').write_text('font')
+        assets.sync_assets(self.manager)
+        self.media.clear_log()
+        self.models.passes = 0
+
+        (self.plugin_dir / f'{PREFIX}font.woff').write_text('new font')
+        assets.sync_assets(self.manager)
+
+        self.assertEqual(self.media.trashed, [f'{PREFIX}font.woff', MANIFEST])
+        self.assertEqual(self.media.added, [f'{PREFIX}font.woff', MANIFEST])
+        self.assertEqual((self.media_dir / f'{PREFIX}font.woff').read_text(),
+                         'new font')
+        self.assertEqual(self.models.passes, 0)
+
+    def test_sync_does_nothing_when_assets_are_up_to_date(self):
+        (self.plugin_dir / f'{PREFIX}main.css').write_text('.main {}\n')
+        assets.sync_assets(self.manager)
+        self.media.clear_log()
+
+        assets.sync_assets(self.manager)
+
+        self.assertEqual(self.media.added, [])
+        self.assertEqual(self.media.trashed, [])
+
+    def test_sync_replaces_assets_installed_without_manifest(self):
+        (self.plugin_dir / f'{PREFIX}main.css').write_text('.main {}\n')
+        (self.media_dir / f'{PREFIX}main.css').write_text('.old {}\n')
+
+        assets.sync_assets(self.manager)
+
+        self.assertEqual(sorted(f.name for f in self.media_dir.iterdir()),
+                         [f'{PREFIX}main.css', MANIFEST])
+        self.assertEqual((self.media_dir / f'{PREFIX}main.css').read_text(),
+                         '.main {}\n')
+
+    def test_sync_replaces_assets_changed_in_media_folder(self):
+        (self.plugin_dir / f'{PREFIX}main.css').write_text('.main {}\n')
+        (self.plugin_dir / f'{PREFIX}font.woff').write_text('font')
+        assets.sync_assets(self.manager)
+        self.media.clear_log()
+
+        (self.media_dir / f'{PREFIX}main.css').write_text('.edit {}\n')
+        (self.media_dir / f'{PREFIX}font.woff').unlink()
+        assets.sync_assets(self.manager)
+
+        self.assertEqual(self.media.trashed, [f'{PREFIX}main.css', MANIFEST])
+        self.assertEqual(self.media.added,
+                         [f'{PREFIX}font.woff', f'{PREFIX}main.css', MANIFEST])
+        self.assertEqual((self.media_dir / f'{PREFIX}main.css').read_text(),
+                         '.main {}\n')
+
+    def test_sync_hashes_installed_assets_only_when_they_change(self):
+        self.manager.hash_cache = HashCache(self.media_dir.parent /
+                                            'hashes.json')
+        (self.plugin_dir / f'{PREFIX}main.css').write_text('.main {}\n')
+        write_manifest(self.manager.plugin_manifest(),
+                       self.plugin_dir / MANIFEST)
+        assets.sync_assets(self.manager)
+        assets.sync_assets(self.manager)
+
+        with mock.patch('gregstyles.assets.manifest.hash_file',
+                        side_effect=hash_file) as hash_mock:
+            self.manager.hash_cache = HashCache(self.media_dir.parent /
+                                                'hashes.json')
+            assets.sync_assets(self.manager)
+            self.assertEqual(hash_mock.call_count, 0)
+
+            # A different size gives the change away without hashing.
+            (self.media_dir / f'{PREFIX}main.css').write_text('.a {}\n')
+            self.assertFalse(self.manager.diff_assets().is_empty())
+            self.assertEqual(hash_mock.call_count, 0)
+
+    def test_sync_does_not_hash_assets_it_installed(self):
+        (self.plugin_dir / f'{PREFIX}main.css').write_text('.main {}\n')
+        (self.plugin_dir / f'{PREFIX}font.woff').write_bytes(b'\0' * 100_000)
+        self.manager.loaded_manifest = self.manager.plugin_manifest()
+        assets.sync_assets(self.manager)
+
+        with mock.patch('gregstyles.assets.manifest.hash_file',
+                        side_effect=hash_file) as hash_mock:
+            self.assertTrue(self.manager.diff_assets().is_empty())
+            hash_mock.assert_not_called()
+
+    def test_fingerprint_changes_only_with_sync_inputs(self):
+        (self.plugin_dir / f'{PREFIX}main.css').write_text('.main {}\n')
+        assets.sync_assets(self.manager)
+        fingerprint = self.manager.fingerprint()
+        self.assertEqual(self.manager.fingerprint(), fingerprint)
+
+        self.models.touch(0)
+        self.assertNotEqual(self.manager.fingerprint(), fingerprint)
+        fingerprint = self.manager.fingerprint()
+
+        (self.media_dir / f'{PREFIX}main.css').unlink()
+        self.assertNotEqual(self.manager.fingerprint(), fingerprint)
+
+    def test_preloaded_plugin_manifest_is_not_read_again(self):
+        (self.plugin_dir / f'{PREFIX}main.css').write_text('.main {}\n')
+        self.manager.loaded_manifest = self.manager.plugin_manifest()
+
+        with mock.patch('gregstyles.assets.read_manifest',
+                        side_effect=read_manifest) as read_mock:
+            self.manager.fingerprint()
+            read_mock.assert_not_called()
+
+    def test_plan_sync_lists_changes_without_writing(self):
+        (self.plugin_dir / f'{PREFIX}main.css').write_text('.main {}\n')
+
+        plan = self.manager.plan_sync()
+
+        self.assertEqual(plan.diff, AssetDiff(added=[f'{PREFIX}main.css']))
+        self.assertEqual(list(plan.media_added),
+                         [f'{PREFIX}main.css', MANIFEST])
+        self.assertEqual(plan.media_added[f'{PREFIX}main.css'], 9)
+        self.assertEqual(plan.media_trashed, [])
+        self.assertEqual([(c.name, c.parts) for c in plan.model_changes],
+                         [('0', ['css'])])
+        self.assertEqual(list(self.media_dir.iterdir()), [])
+        self.assertEqual(self.models.styles, ['.card {}'])
+
+    def test_apply_plan_syncs_assets(self):
+        (self.plugin_dir / f'{PREFIX}main.css').write_text('.main {}\n')
+
+        self.manager.apply_plan(self.manager.plan_sync())
+
+        self.assertEqual((self.media_dir / f'{PREFIX}main.css').read_text(),
+                         '.main {}\n')
+        self.assertIn('.main {}', self.models.styles[0])
+        self.assertTrue(self.manager.plan_sync().is_empty())
+
+    def test_apply_plan_rejects_plan_of_changed_model(self):
+        (self.plugin_dir / f'{PREFIX}main.css').write_text('.main {}\n')
+        plan = self.manager.plan_sync()
+
+        self.models.touch(0)
+
+        with self.assertRaises(assets.OutdatedPlanError):
+            self.manager.apply_plan(plan)
+        self.assertEqual(list(self.media_dir.iterdir()), [])
+
+    def test_sync_does_not_scan_media_folder(self):
+        (self.plugin_dir / f'{PREFIX}main.css').write_text('.main {}\n')
+        (self.media_dir / 'unrelated.jpg').write_text('jpg')
+
+        listdir = os.listdir
+
+        def listdir_except_media(path):
+            self.assertNotEqual(pathlib.Path(path), self.media_dir)
+            return listdir(path)
+
+        with mock.patch('os.listdir', side_effect=listdir_except_media):
+            assets.sync_assets(self.manager)
+
+        self.assertEqual(sorted(f.name for f in self.media_dir.iterdir()),
+                         [f'{PREFIX}main.css', MANIFEST, 'unrelated.jpg'])
+
+    def test_sync_repairs_only_models_that_drifted(self):
+        self.models.add_template('{{Back}}')
+        self.models.add_style('.other {}')
+        self.manager.model_cache = ModelCache(self.media_dir.parent /
+                                              'cache.json')
+        (self.plugin_dir / f'{PREFIX}main.css').write_text('.main {}\n')
+        assets.sync_assets(self.manager)
+        configured_style = self.models.styles[1]
+        self.models.passes = 0
+
+        assets.sync_assets(self.manager)
+        self.assertEqual(self.models.passes, 0)
+
+        self.models.styles[1] = '.other {}'
+        self.models.touch(1)
+        assets.sync_assets(self.manager)
+
+        self.assertEqual(self.models.passes, 1)
+        self.assertEqual(self.models.styles[1], configured_style)
+
+    def test_sync_records_drifted_models_that_need_no_change(self):
+        self.manager.model_cache = ModelCache(self.media_dir.parent /
+                                              'cache.json')
+        (self.plugin_dir / f'{PREFIX}main.css').write_text('.main {}\n')
+        assets.sync_assets(self.manager)
 
-    def install_assets(self) -> None:
-        self.local_version = self.plugin_version
+        self.models.touch(0)
+        plan = assets.sync_assets(self.manager)
 
-    def delete_assets(self) -> None:
-        self.local_version = 0
+        self.assertTrue(plan.is_empty())
+        self.assertEqual(plan.model_stamps, {0: (2, 0)})
+        self.assertEqual(self.manager.plan_sync().model_stamps, {})
+
+    def test_sync_with_imported_styles_does_not_touch_models_on_change(self):
+        self.manager.internal_css = ''
+        self.manager.imported_css = [f'{PREFIX}main.css']
+        self.manager.style_assets = []
+        (self.plugin_dir / f'{PREFIX}main.css').write_text('.main {}\n')
+        assets.sync_assets(self.manager)
+        self.assertIn(f'@import url("{PREFIX}main.css");',
+                      self.models.styles[0])
+        self.models.passes = 0
+
+        (self.plugin_dir / f'{PREFIX}main.css').write_text('.new {}\n')
+        assets.sync_assets(self.manager)
+
+        self.assertEqual(self.models.passes, 0)
+        self.assertEqual((self.media_dir / f'{PREFIX}main.css').read_text(),
+                         '.new {}\n')
+
+    def test_sync_records_report(self):
+        report = SyncReport()
+        self.manager.report = report
+        (self.plugin_dir / f'{PREFIX}main.css').write_text('.main {}\n')
+
+        assets.sync_assets(self.manager, report=report)
+
+        self.assertEqual(report.media_added, 2)
+        self.assertEqual(report.media_trashed, 0)
+        self.assertEqual(report.models_visited, 1)
+        self.assertEqual(report.models_saved, 1)
+        self.assertIn('total', report.phases)
+        self.assertIn('models', report.phases)
+
+    def test_repair_removes_stray_assets(self):
+        (self.plugin_dir / f'{PREFIX}main.css').write_text('.main {}\n')
+        (self.media_dir / f'{PREFIX}asset-version.txt').write_text('19')
+        assets.sync_assets(self.manager)
+
+        self.manager.repair_assets()
+
+        self.assertEqual(sorted(f.name for f in self.media_dir.iterdir()),
+                         [f'{PREFIX}main.css', MANIFEST])
 
 
 class AssetsTestCase(unittest.TestCase):
 
-    def test_sync_assets_syncs_on_version_mismatch(self):
-        manager = FakeAssetManager(local_version=1, plugin_version=2)
-        assets.sync_assets(lambda: True, manager)
-        self.assertEqual(manager.local_version, 2)
+    def test_reconfigure_cards_tree_shakes_internal_css_per_model(self):
+        model_manager = FakeModelManager()
+        plain = model_manager.add('Plain', ['<b>{{Front}}</b>'], '')
+        vim = model_manager.add('Vim', ['{{Code}}'], '')
+        notes = {
+            plain: scan_markup(['text']),
+            vim: scan_markup(['<pre class="vim">x</pre>'])
+        }
+        internal_css = '.cloze { x: 1; }\n.vim pre { x: 2; }'
+
+        assets.reconfigure_cards(AnkiModelModifier(
+            cast(ModelManager, model_manager)),
+                                 external_css=[],
+                                 internal_css=internal_css,
+                                 guard=GUARD,
+                                 note_markup=notes.__getitem__)
+
+        self.assertIn('.cloze', model_manager.models[plain]['css'])
+        self.assertNotIn('.vim', model_manager.models[plain]['css'])
+        self.assertIn('.vim pre', model_manager.models[vim]['css'])
+
+    def anki_asset_manager(
+        self,
+        model_manager: FakeModelManager,
+        tmp_dir: str,
+        note_markup: Optional[assets.NoteMarkup] = None
+    ) -> assets.AnkiAssetManager:
+        plugin_dir = pathlib.Path(tmp_dir) / 'asset-files'
+        media_dir = pathlib.Path(tmp_dir) / 'collection.media'
+        plugin_dir.mkdir()
+        media_dir.mkdir()
+        (plugin_dir / f'{PREFIX}main.css').write_text('.main {}\n')
+        return assets.AnkiAssetManager(AnkiModelModifier(
+            cast(ModelManager, model_manager)),
+                                       cast(MediaManager,
+                                            FakeMediaManager(media_dir)),
+                                       external_css=[],
+                                       internal_css='.main {}\n',
+                                       style_assets=[f'{PREFIX}main.css'],
+                                       guard=GUARD,
+                                       plugin_assets=plugin_dir,
+                                       asset_prefix=PREFIX,
+                                       manifest_name=MANIFEST,
+                                       note_markup=note_markup)
+
+    def test_apply_plan_saves_models_planned_by_anki_model_modifier(self):
+        model_manager = FakeModelManager()
+        mid = model_manager.add('Basic', ['{{Front}}'], '.card {}\n')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            manager = self.anki_asset_manager(model_manager, tmp_dir)
 
-    def test_sync_assets_passes_if_newer_version_present(self):
-        manager = FakeAssetManager(local_version=2, plugin_version=1)
-        assets.sync_assets(lambda: False, manager)
-        self.assertEqual(manager.local_version, 2)
+            manager.apply_plan(manager.plan_sync())
 
-    def test_read_asset_version_returns_none_on_nonexistant_file(self):
-        self.assertEqual(assets.read_asset_version("./foo/bar"), None)
+        self.assertEqual(model_manager.saves, 1)
+        self.assertIn('.main {}', model_manager.models[mid]['css'])
 
-    def test_read_asset_version_returns_version(self):
-        with tempfile.NamedTemporaryFile() as version_f:
-            version_f.writelines([b'42'])
-            version_f.flush()
-            self.assertEqual(assets.read_asset_version(version_f.name), 42)
+    def test_sync_assets_transforms_each_model_once(self):
+        model_manager = FakeModelManager()
+        mids = [
+            model_manager.add('Basic', ['{{Front}}'], '.card {}\n'),
+            model_manager.add('Cloze', ['{{cloze:Text}}'], '.cloze {}\n'),
+        ]
+        scans: List[int] = []
+
+        def note_markup(mid: int) -> Markup:
+            scans.append(mid)
+            return scan_markup(['<div class="main"></div>'])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            assets.sync_assets(
+                self.anki_asset_manager(model_manager, tmp_dir, note_markup))
+
+        # Planning loads and transforms each model. Applying loads it once
+        # more to save the planned content.
+        self.assertEqual(model_manager.loads_by_id, {mid: 2 for mid in mids})
+        self.assertEqual(model_manager.saves_by_id, {mid: 1 for mid in mids})
+        self.assertEqual(sorted(scans), mids)
+
+    def test_sync_assets_updates_on_manifest_mismatch(self):
+        manager = FakeAssetManager(local={'a': ENTRY_1}, plugin={'a': ENTRY_2})
+        assets.sync_assets(manager)
+        self.assertEqual(manager.local, {'a': ENTRY_2})
+
+    def test_sync_assets_passes_if_manifests_match(self):
+        manager = FakeAssetManager(local={'a': ENTRY_1}, plugin={'a': ENTRY_1})
+        assets.sync_assets(manager)
+        self.assertEqual(manager.updates, 0)
+
+    def test_sync_assets_enters_transaction_only_to_make_changes(self):
+        transactions: List[str] = []
+
+        @contextlib.contextmanager
+        def transaction() -> Iterator[None]:
+            transactions.append('begin')
+            yield
+            transactions.append('end')
+
+        manager = FakeAssetManager(local={'a': ENTRY_1}, plugin={'a': ENTRY_1})
+        assets.sync_assets(manager, transaction=transaction)
+        self.assertEqual(transactions, [])
+
+        manager = FakeAssetManager(local={'a': ENTRY_1}, plugin={'a': ENTRY_2})
+        assets.sync_assets(manager, transaction=transaction)
+        self.assertEqual(transactions, ['begin', 'end'])
+        self.assertEqual(manager.local, {'a': ENTRY_2})
+
+    def test_sync_assets_plans_if_manifests_match(self):
+        manager = FakeAssetManager(local={'a': ENTRY_1}, plugin={'a': ENTRY_1})
+        assets.sync_assets(manager)
+        self.assertEqual(manager.plans, 1)
+
+    def test_sync_assets_reports_progress(self):
+        labels: List[str] = []
+        manager = FakeAssetManager(local={'a': ENTRY_1}, plugin={'a': ENTRY_2})
+        assets.sync_assets(manager, progress=labels.append)
+        self.assertEqual(
+            labels,
+            ['Checking assets and cards…', 'Updating assets and cards…'])
 
     def test_configure_and_clear_do_nothing(self):
         tmpl = """{{FrontSide}}
@@ -61,14 +472,118 @@ class AssetsTestCase(unittest.TestCase):
             fake_model_modifier.modify_templates(modify)
 
         guard = 'Anki Greg Styles'
-        assets.configure_cards(fake_model_modifier,
-                               external_css=["ext.css"],
-                               internal_css='.card { color: blue; }\n',
-                               guard=guard)
-        assets.clear_cards(fake_model_modifier, guard=guard)
+        assets.reconfigure_cards(fake_model_modifier,
+                                 external_css=["ext.css"],
+                                 internal_css='.card { color: blue; }\n',
+                                 guard=guard)
+        assets.reconfigure_cards(fake_model_modifier,
+                                 external_css=[],
+                                 internal_css='',
+                                 guard=guard)
         self.assertEqual(old_tmpl, tmpl)
         self.assertEqual(old_css, css)
 
+    def test_reconfigure_cards_replaces_guarded_snippets_in_one_pass(self):
+        guard = 'Anki Greg Styles'
+        fake_model_modifier = FakeModelModifier()
+        fake_model_modifier.add_template('{{Front}}\n')
+        fake_model_modifier.add_style('.card { color: black; }\n')
+        assets.reconfigure_cards(fake_model_modifier,
+                                 external_css=['old.css'],
+                                 internal_css='.old {}\n',
+                                 guard=guard)
+        fake_model_modifier.passes = 0
+
+        assets.reconfigure_cards(fake_model_modifier,
+                                 external_css=['new.css'],
+                                 internal_css='.new {}\n',
+                                 guard=guard)
+
+        self.assertEqual(fake_model_modifier.passes, 1)
+        self.assertEqual(
+            fake_model_modifier.templates,
+            [append_import_statements(['new.css'], [], guard, '{{Front}}\n')])
+        self.assertEqual(fake_model_modifier.styles, [
+            dedent('''\
+                .card { color: black; }
+
+                /* Anki Greg Styles BEGIN */
+                .new {}
+                /* Anki Greg Styles END */
+                ''')
+        ])
+
+    def test_reconfigure_cards_leaves_configured_cards_unmodified(self):
+        guard = 'Anki Greg Styles'
+        fake_model_modifier = FakeModelModifier()
+        fake_model_modifier.add_template('{{Front}}')
+        fake_model_modifier.add_style('.card { color: black; }')
+        assets.reconfigure_cards(fake_model_modifier,
+                                 external_css=['c.css'],
+                                 internal_css='.c {}\n',
+                                 guard=guard)
+
+        report = assets.reconfigure_cards(fake_model_modifier,
+                                          external_css=['c.css'],
+                                          internal_css='.c {}\n',
+                                          guard=guard)
+
+        self.assertEqual(report.modified, [])
+        self.assertEqual(report.unmodified, ['0'])
+
+    def test_reconfigure_cards_switches_inline_styles_to_imports(self):
+        fake_model_modifier = FakeModelModifier()
+        fake_model_modifier.add_template('{{Front}}')
+        fake_model_modifier.add_style('.card { color: black; }\n')
+        assets.reconfigure_cards(fake_model_modifier,
+                                 external_css=[],
+                                 internal_css='.c {}\n',
+                                 guard=GUARD)
+
+        for _ in range(2):
+            assets.reconfigure_cards(fake_model_modifier,
+                                     external_css=[],
+                                     internal_css='',
+                                     guard=GUARD,
+                                     imported_css=['_c.css'])
+
+        self.assertEqual(fake_model_modifier.styles, [
+            dedent('''\
+                /* Anki Greg Styles BEGIN */
+                @import url("_c.css");
+                /* Anki Greg Styles END */
+
+                .card { color: black; }
+                ''')
+        ])
+
+    def test_switching_between_import_and_inline_keeps_styles_stable(self):
+        GUARD = 'Anki Greg Styles'
+        fake_model_modifier = FakeModelModifier()
+        fake_model_modifier.templates = ['{{Front}}\n']
+        fake_model_modifier.styles = ['.card { color: black; }\n']
+
+        for _ in range(3):
+            assets.reconfigure_cards(fake_model_modifier,
+                                     external_css=[],
+                                     internal_css='',
+                                     guard=GUARD,
+                                     imported_css=['_c.css'])
+            assets.reconfigure_cards(fake_model_modifier,
+                                     external_css=[],
+                                     internal_css='.c {}\n',
+                                     guard=GUARD)
+
+        self.assertEqual(fake_model_modifier.styles, [
+            dedent('''\
+                .card { color: black; }
+
+                /* Anki Greg Styles BEGIN */
+                .c {}
+                /* Anki Greg Styles END */
+                ''')
+        ])
+
     def test_append_and_clear_import_statements_do_nothing(self):
         tmpl = """{{FrontSide}}
                     <hr id=answer>
@@ -98,6 +613,12 @@ class AssetsTestCase(unittest.TestCase):
             <!-- Anki Greg Styles END -->
             '''))
 
+    def test_append_import_statements_replaces_appended_ones(self):
+        tmpl = append_import_statements(['old.css'], [], GUARD, '{{Cloze}}')
+        self.assertEqual(
+            append_import_statements(['new.css'], [], GUARD, tmpl),
+            append_import_statements(['new.css'], [], GUARD, '{{Cloze}}'))
+
     def test_append_import_statements_adds_them_with_a_gap_and_minds_a_newline_in_template(
             self):
         self.assertEqual(
@@ -0,0 +1,152 @@
+import io
+import os
+import pathlib
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from anki.collection import Collection
+
+from gregstyles import batch, core
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+
+class BatchTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp_dir.name)
+        self.asset_dir = REPO_ROOT / 'assets'
+        self.assets = core.load_plugin_assets(self.asset_dir)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def new_collection(self, name: str) -> str:
+        (self.root / name).mkdir()
+        path = str(self.root / name / 'collection.anki2')
+        Collection(path).close()
+        return path
+
+    def sync(self, path: str, dry_run: bool = False) -> batch.CollectionResult:
+        return batch.sync_collection(path,
+                                     dict(core.DEFAULT_CONFIG),
+                                     self.assets,
+                                     self.asset_dir,
+                                     self.root / 'cache',
+                                     dry_run=dry_run)
+
+    def test_sync_collection_styles_collection_once(self):
+        path = self.new_collection('a')
+
+        self.assertIn('Models saved: 6', self.sync(path).summary)
+        self.assertIn('Models saved: 0', self.sync(path).summary)
+        # Styles are copied into note types, so no media gets installed.
+        self.assertEqual(os.listdir(self.root / 'a' / 'collection.media'), [])
+
+    def test_sync_collection_embeds_tiny_assets_and_serves_large_ones(self):
+        self.asset_dir = self.root / 'assets'
+        self.asset_dir.mkdir()
+        (self.asset_dir / f'{core.ASSET_PREFIX}main.css').write_text(
+            f'.a {{ background: url({core.ASSET_PREFIX}icon.svg) }}\n'
+            f'.b {{ background: url({core.ASSET_PREFIX}photo.png) }}\n')
+        (self.asset_dir / f'{core.ASSET_PREFIX}icon.svg').write_text('<svg/>')
+        (self.asset_dir / f'{core.ASSET_PREFIX}photo.png').write_bytes(b'\0' *
+                                                                       100_000)
+        self.assets = core.load_plugin_assets(self.asset_dir)
+        path = self.new_collection('a')
+
+        result = self.sync(path)
+
+        self.assertIn(f'Delivery of {core.ASSET_PREFIX}icon.svg: data-uri',
+                      result.summary)
+        col = Collection(path)
+        try:
+            css = col.models.by_name('Basic')['css']
+        finally:
+            col.close()
+        self.assertIn('url("data:image/svg+xml;base64,', css)
+        self.assertIn(f'url({core.ASSET_PREFIX}photo.png)', css)
+        self.assertEqual(
+            sorted(os.listdir(self.root / 'a' / 'collection.media')),
+            [core.MANIFEST_FILE_NAME, f'{core.ASSET_PREFIX}photo.png'])
+
+    def test_dry_run_does_not_modify_collection(self):
+        path = self.new_collection('a')
+
+        self.assertIn('Note types saved: 6',
+                      self.sync(path, dry_run=True).summary)
+        self.assertIn('Note types saved: 6',
+                      self.sync(path, dry_run=True).summary)
+
+    def test_dry_run_does_not_write_caches(self):
+        path = self.new_collection('a')
+        config = dict(core.DEFAULT_CONFIG, style_delivery='import')
+        batch.sync_collection(path, config, self.assets, self.asset_dir,
+                              self.root / 'cache')
+
+        result = batch.sync_collection(path,
+                                       config,
+                                       self.assets,
+                                       self.asset_dir,
+                                       self.root / 'dry-run-cache',
+                                       dry_run=True)
+
+        self.assertIsNone(result.error)
+        self.assertFalse((self.root / 'dry-run-cache').exists())
+
+    def previous_delivery(self, path: str):
+        col = Collection(path)
+        try:
+            return core.previous_delivery(col, self.assets)
+        finally:
+            col.close()
+
+    def test_previous_delivery_follows_installed_manifest(self):
+        path = self.new_collection('a')
+        self.assertEqual(set(self.previous_delivery(path).values()),
+                         {'inline'})
+
+        batch.sync_collection(
+            path, dict(core.DEFAULT_CONFIG, style_delivery='import'),
+            self.assets, self.asset_dir, self.root / 'cache')
+        self.assertEqual(set(self.previous_delivery(path).values()), {'media'})
+
+        self.sync(path)
+        self.assertEqual(set(self.previous_delivery(path).values()),
+                         {'inline'})
+
+    def test_sync_collection_reports_missing_collection(self):
+        path = str(self.root / 'missing.anki2')
+
+        self.assertEqual(self.sync(path).error, 'No such collection.')
+        self.assertFalse(pathlib.Path(path).exists())
+
+    def test_main_syncs_collections_in_parallel_processes(self):
+        paths = [self.new_collection(name) for name in ['a', 'b']]
+        output = io.StringIO()
+
+        with redirect_stdout(output):
+            code = batch.main([
+                'batch', '--assets',
+                str(self.asset_dir), '--cache-dir',
+                str(self.root / 'cache'), '--jobs', '2', *paths
+            ])
+
+        self.assertEqual(code, 0)
+        self.assertIn('Synced 2/2 collections', output.getvalue())
+
+    def test_sync_collections_syncs_each_collection_once(self):
+        path = self.new_collection('a')
+        other_path = os.path.join(self.root, 'a', '..', 'a',
+                                  'collection.anki2')
+
+        with redirect_stdout(io.StringIO()):
+            results = batch.sync_collections([path, other_path],
+                                             dict(core.DEFAULT_CONFIG),
+                                             self.asset_dir,
+                                             self.root / 'cache',
+                                             jobs=2)
+
+        self.assertEqual([result.path for result in results], [path])
@@ -0,0 +1,71 @@
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import unittest
+from textwrap import dedent
+from typing import List
+
+REPO_ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+# Stubs that stand in for Anki. Importing anki fails, so that the test catches
+# eager imports of the add-on’s implementation.
+STUBS = {
+    'aqt/__init__.py':
+    'mw = None\n',
+    'aqt/gui_hooks.py':
+    'profile_did_open = []\n',
+    'anki/__init__.py':
+    'raise ImportError("anki must not be imported with the add-on")\n',
+}
+
+
+def imported_modules(importtime_log: str) -> List[str]:
+    """Parses module names from the output of -X importtime."""
+    modules = []
+    for line in importtime_log.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        modules.append(line.rsplit('|', 1)[1].strip())
+    return modules
+
+
+class ImportTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        stub_dir = pathlib.Path(self.tmp_dir.name)
+        for path, content in STUBS.items():
+            (stub_dir / path).parent.mkdir(exist_ok=True)
+            (stub_dir / path).write_text(content)
+        self.env = dict(os.environ,
+                        PYTHONPATH=os.pathsep.join(
+                            [self.tmp_dir.name,
+                             str(REPO_ROOT)]))
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def run_python(self, code: str) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c',
+             dedent(code)],
+            cwd=self.tmp_dir.name,
+            env=self.env,
+            capture_output=True,
+            text=True,
+            check=True)
+
+    def test_import_only_registers_profile_hook(self):
+        result = self.run_python('''\
+            import gregstyles
+            from aqt import gui_hooks
+            print(gui_hooks.profile_did_open == [gregstyles.on_profile_did_open])
+            ''')
+
+        self.assertEqual(result.stdout, 'True\n')
+        self.assertEqual(
+            sorted(module for module in imported_modules(result.stderr)
+                   if module.split('.')[0] in ('gregstyles', 'aqt', 'anki')),
+            ['aqt', 'aqt.gui_hooks', 'gregstyles'])
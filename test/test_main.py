@@ -1,8 +1,10 @@
+import json
 import os
 import unittest
-from typing import List
+from typing import Any, List
+from unittest import mock
 
-from gregstyles import main
+from gregstyles import core, main
 from gregstyles.main import addon_path
 
 
@@ -18,14 +20,73 @@ class MainTestCase(unittest.TestCase):
     def test_all_files_in_main_and_assets_are_in_sync(self) -> None:
         files_in_assets: List[str] = get_files_in_assets()
 
-        files_in_main: List[str] = [
-            main.ASSET_VERSION_FILE_NAME
-        ] + main.EXTERNAL_STYLES + main.INTERNAL_STYLES
+        files_in_main: List[str] = core.EXTERNAL_STYLES + core.INTERNAL_STYLES
 
         self.assertListEqual(list(sorted(files_in_assets)),
                              list(sorted(files_in_main)))
 
+    def test_manifest_has_compatible_prefix(self) -> None:
+        self.assertTrue(core.MANIFEST_FILE_NAME.startswith(core.ASSET_PREFIX))
+
     def test_all_assets_have_consistent_compatible_prefix(self) -> None:
         for file in get_files_in_assets():
             self.assertTrue(file.startswith('_greg-styles-'),
                             f"Asset {file} does not start with _greg_styles-")
+
+    def test_package_script_bundles_internal_styles(self) -> None:
+        with open(os.path.join('dev', 'bin', 'package')) as f:
+            script = f.read()
+        for file in core.INTERNAL_STYLES + [core.BUNDLED_STYLES_FILE_NAME]:
+            self.assertIn(file, script)
+
+    def test_model_progress_throttles_updates(self) -> None:
+        labels: List[str] = []
+        update = main.model_progress(labels.append)
+        with mock.patch('time.monotonic', side_effect=[100.0, 100.01, 100.02]):
+            update(1, 3)
+            update(2, 3)
+            update(3, 3)
+        self.assertEqual(labels, [
+            'Styling note types (1/3)…',
+            'Styling note types (3/3)…',
+        ])
+
+    def test_plugin_assets_prefer_dev_asset_dir(self) -> None:
+        with mock.patch.object(main, 'dev_asset_dir',
+                               main.pathlib.Path('assets')):
+            self.assertEqual(main.plugin_assets(), main.pathlib.Path('assets'))
+        self.assertEqual(main.plugin_assets(), addon_path / 'asset-files')
+
+    def test_sync_skips_collection_unchanged_since_last_sync(self) -> None:
+
+        def apply_in_transaction(*args: Any, transaction: Any,
+                                 **kwargs: Any) -> None:
+            with transaction():
+                pass
+
+        col = mock.Mock(path='/profile/collection.anki2')
+        manager = mock.Mock()
+        manager.fingerprint.return_value = 'synced'
+        with mock.patch.object(main, 'sync_states', {}), \
+                mock.patch.object(main, 'anki_asset_manager',
+                                  return_value=manager), \
+                mock.patch.object(main, 'sync_assets',
+                                  side_effect=apply_in_transaction) \
+                as sync_assets:
+            changes, _ = main.sync(col, core.DEFAULT_CONFIG)
+            main.sync(col, core.DEFAULT_CONFIG)
+            self.assertEqual(sync_assets.call_count, 1)
+            # The sync is a single undo step.
+            col.add_custom_undo_entry.assert_called_once_with(
+                main.SYNC_UNDO_NAME)
+            col.merge_undo_entries.assert_called_once_with(
+                col.add_custom_undo_entry.return_value)
+            self.assertIs(changes, col.merge_undo_entries.return_value)
+
+            manager.fingerprint.return_value = 'changed'
+            main.sync(col, core.DEFAULT_CONFIG)
+            self.assertEqual(sync_assets.call_count, 2)
+
+    def test_default_config_matches_config_json(self) -> None:
+        with open(os.path.join(addon_path, 'config.json')) as f:
+            self.assertEqual(json.load(f), core.DEFAULT_CONFIG)